@@ -3,6 +3,10 @@ from py_project.weighted_model import WeightedModel
 from py_project.simplified_model import SimplifiedModel
 from py_project.psychoactive_model import PsychoactiveModel
 from py_project.potential_decrease_model import PotentialDecreaseModel
+from py_project.spatial_index import NeighborhoodGraph
+from py_project.network_view import NetworkMap, Blitter, ActivityLines, MIN_SCATTER_SIZE, MAX_SCATTER_POINTS
+from py_project.simulation_worker import SimulationWorker
+from py_project.activity_history import ActivityHistory
 
 from PyQt5 import QtWidgets, QtGui, uic, QtCore
 import sys
@@ -13,11 +17,14 @@ from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as Navigatio
 
 class NeuralNetwork():
     """Create an user interface to interact with the simulation of Neural Network."""
-    MIN_SCATTER_SIZE = 50
-    FRAMES_PER_UPDATE = 5
+    STEPS_PER_SECOND = 5  # pace of the simulation, None to run it as fast as possible
+    FRAME_INTERVAL = 40  # ms between two frames drawn
+    HISTORY_LENGTH = 1000  # steps shown by the view of the number of active neurons
 
     def __init__(self):
         self.model = None
+        self.worker = None
+        self.graph = None
         self.dlg = UI_NeuralNetwork()
         # Parameters of model changed
         self.dlg.nb_neurons.valueChanged.connect(self.change_parameters)
@@ -26,8 +33,10 @@ class NeuralNetwork():
         self.dlg.alco_concen.valueChanged.connect(self.change_parameters)
         self.dlg.deltaT.valueChanged.connect(self.change_parameters)
 
-        # Type of model changes based on these options -> recreate model
-        self.dlg.dist.valueChanged.connect(self.init_model)
+        # Radius of connection changed -> only the connections crossing the radius change
+        self.dlg.dist.valueChanged.connect(self.change_dist)
+
+        # Type of model changes based on these options -> recreate model on the same neurons
         self.dlg.poids.clicked.connect(self.init_model)
         self.dlg.psycho.clicked.connect(self.init_model)
         self.dlg.decrease_poten.clicked.connect(self.init_model)
@@ -56,10 +65,21 @@ class NeuralNetwork():
         layout.addWidget(self.toolbar)
         layout.addWidget(self.canvas)
         self.dlg.graphicsView.setLayout(layout)
-
-        # Timer to repeatedly call the plot function
+        # The map is created once, each frame only updates its points (or density image) and blits it
+        self.map = NetworkMap(self.ax, [], [], MIN_SCATTER_SIZE, MAX_SCATTER_POINTS,
+                              vmin=WeightedModel.Vmin, vmax=SimplifiedModel.Vmax)
+        self.blitter = Blitter(self.canvas, self.ax, self.map.artists)
+        # View of the number of active neurons, in its own axes shown instead of the map
+        self.ax_activity = self.fig.add_subplot(111, label='activity')
+        self.ax_activity.set_visible(False)
+        self.activity = ActivityLines(self.ax_activity, NeuralNetwork.HISTORY_LENGTH,
+                                      PotentialDecreaseModel.NB_PHASES)
+        self.activity_blitter = Blitter(self.canvas, self.ax_activity, self.activity.artists)
+
+        # Timer to repeatedly call the plot function, which draws the last state published by the
+        # worker that simulates the model in its own thread
         self.timer = QtCore.QTimer()
-        self.timer.setInterval(1000)
+        self.timer.setInterval(NeuralNetwork.FRAME_INTERVAL)
         self.timer.timeout.connect(self.plot)
 
         self.dlg.start.clicked.connect(self.start)
@@ -71,21 +91,25 @@ class NeuralNetwork():
         Otherwise, reinit the model."""
         if self.model is None:
             self.init_model()
-        self.model.start_syst()
+        with self.worker.lock:
+            self.model.start_syst()
+            self.worker.publish()
+        self.worker.resume()
         self.timer.start()
         # self.plot()
 
     def plot(self):
         """Plot the graphic of simulation of model in regards of the graphic choice"""
-        color = ['red' if self.model.syst_state[i] == 1 else
-                 ('green' if self.model.syst_potential[i] >= 0 else 'blue') for i in range(self.model.N)]
-        size = [abs(x) + NeuralNetwork.MIN_SCATTER_SIZE for x in self.model.syst_potential]
-        self.ax.cla()
-        self.ax.scatter(self.coord_X, self.coord_Y, s=size, lw=0.5, c=color, edgecolors=None)
-        self.canvas.draw()
-        if not self.model.non_transmittable():
-            self.model.update_system_one_step()
-        else:
+        dead = self.worker.dead
+        snapshot = self.worker.snapshots.latest()
+        if self.dlg.nbActive.isChecked():
+            self.activity.update(*self.worker.history.series())
+            self.activity_blitter.update()
+        elif snapshot is not None:
+            step, arrays = snapshot
+            self.map.update(arrays['syst_state'], arrays['syst_potential'])
+            self.blitter.update()
+        if dead:
             print("The network is dead. No neuron is capable of sending signals. Please click start to continue feeding signals.")
             self.timer.stop()
 
@@ -93,60 +117,45 @@ class NeuralNetwork():
         #     self.model.update_system_one_step()
         #     color = ['red' if self.model.syst_state[i] == 1 else
         #              ('green' if self.model.syst_potential[i] >= 0 else 'blue') for i in range(self.model.N)]
-        #     size = [abs(x) + NeuralNetwork.MIN_SCATTER_SIZE for x in self.model.syst_potential]
+        #     size = [abs(x) + MIN_SCATTER_SIZE for x in self.model.syst_potential]
         #     self.ax.cla()
         #     self.ax.scatter(self.coord_X, self.coord_Y, s=size, lw=0.5, c=color, edgecolors=None)
         #     self.canvas.draw()
 
     def init_model(self):
-        """Create model when START clicked or type of model changed"""
-        self.coord_X = self.init_coord(self.dlg.nb_neurons.value())
-        self.coord_Y = self.init_coord(self.dlg.nb_neurons.value())
-        if not (self.dlg.poids.isChecked() or self.dlg.psycho.isChecked() or self.dlg.decrease_poten.isChecked()):
-            self.model = SimplifiedModel(
-                self.dlg.nb_neurons.value(),
-                self.dlg.beta.value(),
-                self.dlg.gamma.value()
-            )
+        """Create model when START clicked or type of model changed.
+        When only the type of model changes, the new model is built on the same neurons and
+        structure of connections (self.graph), they are drawn again only if N changed."""
+        N = self.dlg.nb_neurons.value()
+        beta = self.dlg.beta.value()
+        gamma = self.dlg.gamma.value()
+        if self.graph is None or self.graph.N != N:
+            self.coord_X = self.init_coord(N)
+            self.coord_Y = self.init_coord(N)
             self.init_syst_links_dist()
+        links = self.graph.links(gamma / beta)
+        if not (self.dlg.poids.isChecked() or self.dlg.psycho.isChecked() or self.dlg.decrease_poten.isChecked()):
+            self.model = SimplifiedModel(N, beta, gamma, links=links)
 
         elif self.dlg.poids.isChecked():
-            self.model = WeightedModel(
-                self.dlg.nb_neurons.value(),
-                self.dlg.beta.value(),
-                self.dlg.gamma.value()
-            )
-            self.init_syst_links_dist()
-            self.model.init_system_links_weighted()
+            self.model = WeightedModel(N, beta, gamma, links=links)
 
         elif self.dlg.psycho.isChecked() and not self.dlg.decrease_poten.isChecked():
-            self.model = PsychoactiveModel(
-                self.dlg.nb_neurons.value(),
-                self.dlg.beta.value(),
-                self.dlg.alco_concen.value()
-            )
-            self.init_syst_links_dist()
-            self.model.init_system_links_ca()
+            self.model = PsychoactiveModel(N, beta, gamma, self.dlg.alco_concen.value(), links=links)
 
         elif self.dlg.decrease_poten.isChecked():
-            if self.dlg.psycho.isChecked():
-                self.model = PotentialDecreaseModel(
-                    self.dlg.nb_neurons.value(),
-                    self.dlg.beta.value(),
-                    self.dlg.gamma.value(),
-                    self.dlg.alco_concen.value(),
-                    self.dlg.deltaT.value()
-                )
-            else:
-                self.model = PotentialDecreaseModel(
-                    self.dlg.nb_neurons.value(),
-                    self.dlg.beta.value(),
-                    self.dlg.gamma.value(),
-                    0,
-                    self.dlg.deltaT.value()
-                )
-            self.init_syst_links_dist()
-            self.model.init_system_links_ca()
+            ca = self.dlg.alco_concen.value() if self.dlg.psycho.isChecked() else 0
+            self.model = PotentialDecreaseModel(N, beta, gamma, ca, self.dlg.deltaT.value(), links=links)
+
+        if self.worker is None:
+            history = ActivityHistory(NeuralNetwork.HISTORY_LENGTH, PotentialDecreaseModel.NB_PHASES)
+            self.worker = SimulationWorker(self.model, NeuralNetwork.STEPS_PER_SECOND, history)
+            self.worker.start()
+        with self.worker.lock:
+            self.worker.model = self.model
+            self.worker.history.clear()
+            self.worker.publish()
+        self.scale_activity()
 
 
     def init_coord(self, N):
@@ -154,52 +163,80 @@ class NeuralNetwork():
         return [random.randint(0, 500) for i in range(N)]
 
     def init_syst_links_dist(self):
-        """Create a matrix of 2 dimensions which shows the connections between neurons in the system.
+        """Create the structure of connections between the neurons in the system (self.graph).
         Only neurons within the R radian of another neuron i can send or receive signal from and to i
-        syst_links[i][j] = gamme/beta: j connects and can send signal to i, not in reverse
-        syst_links[i][j] = 0: j doesnt connect to i"""
-
-        # alias: Point = (x,y)
-        def distance_carre(P1, P2):
-            x1, y1 = P1
-            x2, y2 = P2
-            return (x1 - x2) ** 2 + (y1 - y2) ** 2
-
-        # Create a matrix that only allows connections between 2 neurons if whose distance is inferior to R
-        syst_links = []
-        R = self.dlg.dist.value()
-        for i in range(self.model.N):
-            syst_links.append([])
-            for j in range(self.model.N):
-                if i != j:
-                    if distance_carre((self.coord_X[i], self.coord_Y[i]), (self.coord_X[j], self.coord_Y[j])) <= R ** 2:
-                        syst_links[i].append(random.choice([0, 1, 1, 1, 1]))  # increase the chance of two neurons connected
-                    else:
-                        syst_links[i].append(0)
-                else:
-                    syst_links[i].append(self.model.gamma / self.model.beta)
-        self.model.syst_links = syst_links
+        syst_links[i][j] = 1: j connects and can send signal to i, not in reverse
+        syst_links[i][j] = 0: j doesnt connect to i
+        Two neurons within the radian are connected with a chance of 4/5.
+        The models are built on it (the weighted models draw their weights on these connections)."""
+
+        # Only pairs of neurons whose distance is inferior to R can be connected, they are found with a spatial
+        # index instead of comparing all the pairs of neurons
+        self.graph = NeighborhoodGraph(self.coord_X, self.coord_Y, self.dlg.dist.value())
+        self.coord_X, self.coord_Y = self.graph.coord_X, self.graph.coord_Y
+        self.map.set_coords(self.coord_X, self.coord_Y)
+
+    def update_model_links(self):
+        """Give the connections of self.graph to the model, which keeps the state of its neurons"""
+        self.model.set_links(self.graph.links(self.model.gamma / self.model.beta, self.model.links_format))
+
+    def change_dist(self):
+        """Change the radius of connection: only the pairs of neurons between the old and the new
+        radius are connected or disconnected, the other connections and the model are kept"""
+        if self.graph is None:
+            return
+        self.graph.set_radius(self.dlg.dist.value())
+        if self.model is not None:
+            with self.worker.lock:
+                self.update_model_links()
+
+    def change_nb_neurons(self, N):
+        """Add neurons at random places or remove the last neurons with their connections, the
+        other neurons keep their place, connections and state"""
+        added = max(N - self.graph.N, 0)
+        self.graph.resize(N, self.init_coord(added), self.init_coord(added))
+        self.coord_X, self.coord_Y = self.graph.coord_X, self.graph.coord_Y
+        self.map.set_coords(self.coord_X, self.coord_Y)
+        self.model.resize(N, self.graph.links(self.model.gamma / self.model.beta, self.model.links_format))
+        self.scale_activity()
 
     def change_parameters(self):
         """Change parameters of model internally"""
-        if self.model.N != self.dlg.nb_neurons.value():
-            self.init_model()
-        if self.model.gamma != self.dlg.gamma.value():
-            self.model.gamma = self.dlg.gamma.value()
-        if self.model.beta != self.dlg.beta.value():
-            self.model.beta = self.dlg.beta.value()
-        if self.dlg.psycho.isChecked() and self.model.ca != self.dlg.alco_concen.value():
-            self.model.ca = self.dlg.alco_concen.value()
-            self.model.init_system_links_ca()
-        if self.dlg.decrease_poten.isChecked() and self.model.deltaT != self.dlg.deltaT.value():
-            self.model.deltaT = self.dlg.deltaT.value()
+        if self.model is None:
+            return
+        # the worker doesn't step the model while it is modified
+        with self.worker.lock:
+            if self.model.N != self.dlg.nb_neurons.value():
+                self.change_nb_neurons(self.dlg.nb_neurons.value())
+            if self.model.gamma != self.dlg.gamma.value():
+                self.model.gamma = self.dlg.gamma.value()
+            if self.model.beta != self.dlg.beta.value():
+                self.model.beta = self.dlg.beta.value()
+            if self.dlg.psycho.isChecked() and self.model.ca != self.dlg.alco_concen.value():
+                self.model.update_ca(self.dlg.alco_concen.value())
+            if self.dlg.decrease_poten.isChecked() and self.model.deltaT != self.dlg.deltaT.value():
+                self.model.deltaT = self.dlg.deltaT.value()
+            self.worker.publish()
 
 
     def change_view(self):
-        pass
+        """Show the map of the network or the number of active neurons over the last steps"""
+        activity = self.dlg.nbActive.isChecked()
+        self.ax.set_visible(not activity)
+        self.ax_activity.set_visible(activity)
+        self.canvas.draw_idle()
+
+    def scale_activity(self):
+        """Fit the view of the number of active neurons to the model (N, phases)"""
+        self.activity.set_scale(self.model.N)
+        self.activity.show_phases(isinstance(self.model, PotentialDecreaseModel))
+        self.canvas.draw_idle()
 
     def pause(self):
-        pass
+        """Suspend the simulation after its current step, START feeds signals and continues it"""
+        if self.worker is not None:
+            self.worker.pause()
+        self.timer.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class ActivityHistory:
+    """History of the activity of a simulation over its last capacity steps: the number of
+    active neurons and of neurons in each phase (nb_phases columns, 0 for the models without
+    phases) at each step.
+
+    The rows are kept in a fixed-size numpy ring buffer: recording a step writes one row over
+    the oldest one, so a simulation of any length uses the same memory and the view drawing it
+    always draws capacity points at most. The counts come from the counters kept by the model
+    during its step (nb_active, phase_counts), nothing is counted again:
+        history.record(step, model.nb_active, model.phase_counts)
+        steps, nb_active, phase_counts = history.series()
+
+    One thread can record while another reads the series: a row is written before being counted
+    and the oldest row, the one that can be overwritten during the read, is not given."""
+
+    def __init__(self, capacity, nb_phases=0):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.capacity = capacity
+        self.nb_phases = nb_phases
+        self._rows = np.zeros((capacity, 2 + nb_phases), dtype=np.int64)
+        self.nb_recorded = 0
+
+    def __len__(self):
+        return min(self.nb_recorded, self.capacity - 1)
+
+    def clear(self):
+        self.nb_recorded = 0
+
+    def record(self, step, nb_active, phase_counts=None):
+        row = self._rows[self.nb_recorded % self.capacity]
+        row[0] = step
+        row[1] = nb_active
+        if self.nb_phases:
+            row[2:] = 0 if phase_counts is None else phase_counts
+        self.nb_recorded += 1
+
+    def series(self):
+        """Return the arrays (steps, nb_active, phase_counts (steps, nb_phases)) of the steps
+        recorded, from the oldest to the last one"""
+        end = self.nb_recorded
+        size = min(end, self.capacity - 1)
+        positions = np.arange(end - size, end) % self.capacity
+        rows = self._rows[positions]
+        return rows[:, 0], rows[:, 1], rows[:, 2:]
@@ -0,0 +1,99 @@
+"""Run a model from the command line, without the dialog nor any graphic library.
+
+    python -m py_project.batch_runner potential_decrease --N 2000 --steps 100000 \\
+        --metrics metrics.csv --trajectory run --decimation 10 --checkpoint run.npz
+
+The model is built from the arguments (see parameter_sweep.build_model) and simulated with
+its simulation() generator, which feeds signals to the network again each time it can no
+longer transmit. Only numpy is needed so it starts fast on the compute nodes."""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from py_project.parameter_sweep import MODELS, PARAMETERS, build_model
+from py_project.trajectory import TrajectoryRecorder
+from py_project.instrumentation import StepProfiler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a neural network model headless.")
+    parser.add_argument('model', choices=list(MODELS), help="type of model to simulate")
+    parser.add_argument('--N', type=int, default=200, help="number of neurons")
+    for name, default in PARAMETERS.items():
+        parser.add_argument('--' + name, type=float, default=default,
+                            help=f"parameter {name} of the model (default {default})")
+    parser.add_argument('--links-format', choices=['dense', 'csr', 'csc'], default='dense',
+                        help="format of the store of links")
+    parser.add_argument('--steps', type=int, default=1000, help="number of steps of simulation")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the model (network and kick-offs)")
+    parser.add_argument('--metrics', help="csv file where the metrics of each step are written")
+    parser.add_argument('--metrics-every', type=int, default=1, help="write the metrics every k steps")
+    parser.add_argument('--trajectory', help="directory where the trajectory is recorded")
+    parser.add_argument('--decimation', type=int, default=1, help="record one frame every k steps")
+    parser.add_argument('--chunk-size', type=int, default=1024, help="frames bufferized before writing")
+    parser.add_argument('--checkpoint', help="file .npz where the state of the model is saved")
+    parser.add_argument('--checkpoint-every', type=int, default=0,
+                        help="save a checkpoint every k steps (only at the end if 0)")
+    parser.add_argument('--resume', help="checkpoint .npz to continue instead of building a new model")
+    parser.add_argument('--profile', help="json file where the trace of the steps is written "
+                                          "(the summary goes to the same name ending by .summary.json)")
+    parser.add_argument('--verbose', action='store_true', help="print a message at each kick-off of the model")
+    return parser.parse_args(argv)
+
+
+def run(args):
+    """Build (or restore) the model described by args, simulate it and write the outputs asked.
+    Return the model at the end of the simulation."""
+    if args.resume:
+        model, coords = MODELS[args.model].load_checkpoint(args.resume), None
+    else:
+        model, coords = build_model(args.model, args.N, args.beta, args.gamma, args.ca, args.dist,
+                                    args.deltaT, args.links_format, seed=args.seed)
+
+    metrics = open(args.metrics, 'w') if args.metrics else None
+    recorder = None
+    if args.trajectory:
+        recorder = TrajectoryRecorder(args.trajectory, model.N, args.steps, args.decimation,
+                                      args.chunk_size, coords, type(model).__name__)
+    if metrics:
+        metrics.write('step,kicked,nb_active,mean_potential\n')
+    if args.profile:
+        model.profiler = StepProfiler(trace=True)
+
+    model.verbose = args.verbose
+    start = time.perf_counter()
+    simulation = model.simulation(args.steps)
+    for step in range(args.steps):
+        kicked = model.non_transmittable()
+        state, potential = next(simulation)
+        if metrics and step % args.metrics_every == 0:
+            metrics.write(f'{step},{int(kicked)},{int(np.sum(state))},{np.mean(potential)}\n')
+        if recorder:
+            recorder.append(state, potential)
+        if args.checkpoint and args.checkpoint_every and (step + 1) % args.checkpoint_every == 0:
+            model.save_checkpoint(args.checkpoint)
+    elapsed = time.perf_counter() - start
+
+    if metrics:
+        metrics.close()
+    if recorder:
+        recorder.close()
+    if args.checkpoint:
+        model.save_checkpoint(args.checkpoint)
+    if args.profile:
+        model.profiler.export_trace(args.profile)
+        model.profiler.export_summary(os.path.splitext(args.profile)[0] + '.summary.json')
+    print(f"{type(model).__name__} N={model.N}: {args.steps} steps in {elapsed:.2f} s "
+          f"({args.steps / max(elapsed, 1e-9):.1f} steps/s)", file=sys.stderr)
+    return model
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Measure how the models scale with the size and the density of the network.
+
+    python -m py_project.benchmark --output bench.json
+    python -m py_project.benchmark --compare old.json new.json
+    python -m py_project.benchmark --event 0.002 --sizes 2000 20000 --densities 0.001
+
+For each model, number of neurons N and density of connections, the benchmark times:
+    links_s: building the links of the network with the spatial index (links_within_distance)
+    init_s: creating the model on these links (weighted / ca initialization included)
+    random_init_s: creating the model on its own random links (init_system_links, weights, ca),
+        up to MAX_DENSE neurons
+    start_s: one call of start_syst
+    steps_per_s: steps of simulation() per second, the network being kicked off again when it
+        dies out (mean_active: mean number of active neurons during these steps)
+and measures the peak of memory allocated (tracemalloc) while building the model and running
+a few steps. The results are written into a json file to compare two versions of the code.
+With --event, the full and event-driven steps are compared at a low activity instead."""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from py_project.psychoactive_model import PsychoactiveModel
+from py_project.potential_decrease_model import PotentialDecreaseModel
+from py_project.parameter_sweep import MODELS
+from py_project.spatial_index import links_within_distance
+from py_project.stimulus import PoissonStimulus
+
+SIZES = [100, 500, 2000, 10000]
+DENSITIES = [0.01, 0.05, 0.2]
+# above this size, the links are stored in a sparse format (a dense matrix would take N*N*8 bytes)
+MAX_DENSE = 2000
+SIDE = 500.
+
+
+def radius_for_density(density):
+    """Radius of connection giving about a fraction density of connected pairs of neurons
+    placed uniformly in a square SIDE x SIDE (4/5 of the close pairs are connected)"""
+    return math.sqrt(density * SIDE ** 2 / (0.8 * math.pi))
+
+
+def create(model, N, links_format, links=None, seed=0):
+    """Create the model on links, or on its own random links (init_system_links, then the weights
+    and the effect of ca for the models having them) if links is None"""
+    if MODELS[model] is PotentialDecreaseModel:
+        network = PotentialDecreaseModel(N, 0.3, 0.9, 0.2, 0.05, links_format, links, seed=seed)
+    elif MODELS[model] is PsychoactiveModel:
+        network = PsychoactiveModel(N, 0.3, 0.9, 0.2, links_format, links, seed=seed)
+    else:
+        network = MODELS[model](N, 0.3, 0.9, links_format, links, seed=seed)
+    network.verbose = False
+    return network
+
+
+def build(model, N, density, links_format):
+    """Build the links then the model, always the same for the same arguments,
+    return (model, links_s, init_s)"""
+    rng = np.random.default_rng(0)
+    coord_X = rng.uniform(0, SIDE, N)
+    coord_Y = rng.uniform(0, SIDE, N)
+    start = time.perf_counter()
+    links = links_within_distance(coord_X, coord_Y, radius_for_density(density), 0.9 / 0.3, fmt=links_format,
+                                  rng=rng)
+    links_s = time.perf_counter() - start
+    start = time.perf_counter()
+    network = create(model, N, links_format, links)
+    init_s = time.perf_counter() - start
+    return network, links_s, init_s
+
+
+def bench_case(model, N, density, links_format, min_time=0.5, max_steps=1000):
+    """Run the benchmark of one case and return its results as a dict"""
+    network, links_s, init_s = build(model, N, density, links_format)
+    start = time.perf_counter()
+    network.start_syst()
+    start_s = time.perf_counter() - start
+
+    # the steps go through simulation(), which kicks the network off again when it dies out, so
+    # that the steps timed transmit signals
+    nb_steps, nb_active = 0, 0
+    start = time.perf_counter()
+    for state, potential in network.simulation(max_steps):
+        nb_steps += 1
+        nb_active += network.nb_active
+        if time.perf_counter() - start >= min_time:
+            break
+    steps_s = time.perf_counter() - start
+
+    # the models drawing their own links (init_system_links and the weights) build a dense N x N
+    # matrix first, only timed up to MAX_DENSE neurons
+    random_init_s = None
+    if N <= MAX_DENSE:
+        start = time.perf_counter()
+        create(model, N, links_format)
+        random_init_s = time.perf_counter() - start
+
+    # the peak of memory is measured in a second run as tracemalloc slows down the allocations
+    tracemalloc.start()
+    network, _, _ = build(model, N, density, links_format)
+    network.start_syst()
+    for i in range(3):
+        network.update_system_one_step()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'model': model, 'N': N, 'density': density, 'format': links_format,
+            'nnz': network.syst_links.nnz, 'links_s': links_s, 'init_s': init_s,
+            'random_init_s': random_init_s, 'start_s': start_s, 'steps': nb_steps,
+            'steps_per_s': nb_steps / steps_s, 'mean_active': nb_active / nb_steps, 'peak_mb': peak / 2 ** 20}
+
+
+def bench_event(N, density, rate, nb_steps=500):
+    """Time simulation() of PotentialDecreaseModel with the full step and with the event-driven
+    step (links in csc) on the same network, kicked off by a PoissonStimulus firing a fraction
+    rate of the neurons: the lower the activity, the faster the event-driven step. Return the
+    results as a dict."""
+    rng = np.random.default_rng(0)
+    coord_X = rng.uniform(0, SIDE, N)
+    coord_Y = rng.uniform(0, SIDE, N)
+    links = links_within_distance(coord_X, coord_Y, radius_for_density(density), 0.9 / 0.3, fmt='csc', rng=rng)
+    res = {'N': N, 'density': density, 'rate': rate, 'steps': nb_steps}
+    for name, event_driven in (('full', False), ('event', True)):
+        network = PotentialDecreaseModel(N, 0.3, 0.9, 0.2, 0.05, 'csc', links, seed=0)
+        network.stimulus = PoissonStimulus(rate, 60.)
+        network.verbose = False
+        nb_active = 0
+        start = time.perf_counter()
+        for state, potential in network.simulation(nb_steps, event_driven):
+            nb_active += network.nb_active
+        res[name + '_steps_per_s'] = nb_steps / (time.perf_counter() - start)
+    res['mean_active'] = nb_active / nb_steps
+    return res
+
+
+def run(models, sizes, densities, links_format=None, min_time=0.5, max_steps=1000, log=sys.stderr):
+    """Benchmark all the combinations of models, sizes and densities. links_format=None chooses
+    'dense' up to MAX_DENSE neurons and 'csr' above."""
+    results = []
+    for model in models:
+        for N in sizes:
+            for density in densities:
+                fmt = links_format or ('dense' if N <= MAX_DENSE else 'csr')
+                res = bench_case(model, N, density, fmt, min_time, max_steps)
+                results.append(res)
+                random_init = '-' if res['random_init_s'] is None else f"{res['random_init_s']:.3f} s"
+                print(f"{model:>18} N={N:<6} density={density:<5} {fmt:>5}: links {res['links_s']:.3f} s, "
+                      f"init {res['init_s']:.3f} s, random init {random_init}, start {res['start_s']:.3f} s, "
+                      f"{res['steps_per_s']:.1f} steps/s ({res['mean_active']:.1f} active), "
+                      f"peak {res['peak_mb']:.1f} MB", file=log)
+    return {'meta': {'date': datetime.now(timezone.utc).isoformat(), 'python': platform.python_version(),
+                     'numpy': np.__version__, 'machine': platform.machine(), 'platform': platform.platform()},
+            'results': results}
+
+
+def compare(old, new, log=sys.stdout):
+    """Print the ratio new / old of the throughput and the times of the cases found in both files"""
+    def key(res):
+        return res['model'], res['N'], res['density'], res['format']
+    old_results = {key(res): res for res in old['results']}
+    for res in new['results']:
+        before = old_results.get(key(res))
+        if before is None:
+            continue
+        random_init = ''
+        if res.get('random_init_s') is not None and before.get('random_init_s') is not None:
+            random_init = f"random init x{res['random_init_s'] / max(before['random_init_s'], 1e-12):.2f}, "
+        print(f"{res['model']:>18} N={res['N']:<6} density={res['density']:<5} {res['format']:>5}: "
+              f"steps/s x{res['steps_per_s'] / before['steps_per_s']:.2f}, "
+              f"links x{res['links_s'] / max(before['links_s'], 1e-12):.2f}, "
+              f"init x{res['init_s'] / max(before['init_s'], 1e-12):.2f}, {random_init}"
+              f"peak x{res['peak_mb'] / max(before['peak_mb'], 1e-12):.2f}", file=log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the models of neural network.")
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--densities', nargs='+', type=float, default=DENSITIES)
+    parser.add_argument('--links-format', choices=['dense', 'csr', 'csc'], default=None,
+                        help=f"format of the links (dense up to {MAX_DENSE} neurons then csr by default)")
+    parser.add_argument('--min-time', type=float, default=0.5, help="minimal time spent on the steps of a case")
+    parser.add_argument('--max-steps', type=int, default=1000, help="maximal number of steps of a case")
+    parser.add_argument('--output', default='benchmark_results.json', help="json file of the results")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two files of results")
+    parser.add_argument('--event', type=float, metavar='RATE', default=None,
+                        help="compare the full and event-driven steps on networks kicked off by a fraction "
+                             "RATE of the neurons (PotentialDecreaseModel, csc)")
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            compare(json.load(f_old), json.load(f_new))
+        return
+    if args.event is not None:
+        for N in args.sizes:
+            for density in args.densities:
+                res = bench_event(N, density, args.event, args.max_steps)
+                print(f"N={N:<6} density={density:<6} {res['mean_active']:.1f} active: "
+                      f"full {res['full_steps_per_s']:.1f} steps/s, event {res['event_steps_per_s']:.1f} steps/s")
+        return
+    results = run(args.models, args.sizes, args.densities, args.links_format, args.min_time, args.max_steps)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
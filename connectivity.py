@@ -0,0 +1,350 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+def expand_ranges(first, last):
+    """array * array -> array
+    Return the concatenation of the ranges [first[k], last[k]) for all k, without python loop."""
+    counts = last - first
+    starts = np.repeat(first - (np.cumsum(counts) - counts), counts)
+    return starts + np.arange(int(counts.sum()))
+
+
+class Links(ABC):
+    """Store of the connections (syst_links) of a neural network of N neurons.
+
+    syst_links[i][j] is the weight of the link that allows j to send signal to i and
+    syst_links[i][i] is the leaking coefficient of the neuron i. The diagonal is kept
+    apart from the other links in the vector diag, the other links (off-diagonal) are
+    stored in a flat array data. Each format decides which links are stored in data
+    and in which order:
+        DenseLinks: all the N*N values of the matrix, row after row
+        CSRLinks: only the non zero links, row after row (Compressed Sparse Row)
+        CSCLinks: only the non zero links, column after column (Compressed Sparse Column)
+
+    The models only use the methods defined here so any format can be plugged into
+    SimplifiedModel and its subclasses:
+        matvec(x): the product of the links (without the diagonal) with a vector
+        row_index(i) / column_index(j): positions in data of the links of a row / column
+        row_positions(rows): positions in data of the links of a set of rows
+        gather_columns(cols): all the links sent by a set of neurons
+        locate(positions): rows and columns of the links stored at positions of data
+    The values of data can be modified in place, the structure of the store can not."""
+
+    format = None
+
+    def __init__(self, N, data, diag):
+        self.N = N
+        self.data = data
+        self.diag = diag
+
+    @property
+    def nnz(self):
+        """Number of non zero links, the diagonal excluded"""
+        return int(np.count_nonzero(self.data))
+
+    @abstractmethod
+    def matvec(self, x):
+        """array(N,) -> array(N,)
+        Return sum(syst_links[i][j] * x[j]) for j != i for every neuron i."""
+
+    @abstractmethod
+    def row_index(self, i):
+        """int -> array
+        Positions in data of the links received by the neuron i (diagonal excluded)."""
+
+    @abstractmethod
+    def column_index(self, j):
+        """int -> array
+        Positions in data of the links sent by the neuron j (diagonal excluded)."""
+
+    @abstractmethod
+    def row_positions(self, rows):
+        """array -> array
+        Positions in data of the links received by all the neurons rows (diagonal excluded),
+        to modify their values with one array operation."""
+
+    @abstractmethod
+    def gather_columns(self, cols):
+        """array -> tuple(array, array, array)
+        Return the arrays (rows, cols, values) of the stored links sent by the neurons cols
+        (diagonal excluded), in a time proportional to the number of these links for CSC."""
+
+    @abstractmethod
+    def locate(self, positions):
+        """array -> tuple(array, array)
+        Return the arrays (rows, cols) of the links stored at the positions of data, to modify
+        data in bulk (for DenseLinks, the positions of the diagonal give rows == cols)."""
+
+    @abstractmethod
+    def to_coo(self):
+        """Return the arrays (rows, cols, values) of the non zero links, diagonal excluded."""
+
+    def to_dense(self):
+        """Return the matrix (N, N) of the links, diagonal included."""
+        rows, cols, values = self.to_coo()
+        matrix = np.zeros((self.N, self.N), dtype=float)
+        matrix[rows, cols] = values
+        np.fill_diagonal(matrix, self.diag)
+        return matrix
+
+    def asformat(self, fmt):
+        """Convert the store into the format fmt ('dense', 'csr' or 'csc')."""
+        if fmt == self.format:
+            return self
+        if fmt == 'dense':
+            return DenseLinks(self.to_dense())
+        rows, cols, values = self.to_coo()
+        return LINKS_FORMATS[fmt].from_coo(self.N, rows, cols, values, self.diag)
+
+    @abstractmethod
+    def to_arrays(self):
+        """Return a dict of the arrays needed to rebuild the store with links_from_arrays"""
+
+    def copy(self):
+        """Return a copy of the store whose values can be modified without changing this one"""
+        arrays = self.to_arrays()
+        return links_from_arrays({key: np.copy(value) for key, value in arrays.items()})
+
+    def __getitem__(self, i):
+        """Return the row i of the matrix of links (diagonal included).
+        Only kept for the code reading syst_links[i][j]: for the sparse formats, it's a copy."""
+        row = np.zeros(self.N, dtype=float)
+        index = self.row_index(i)
+        row[self._other_end(index)] = self.data[index]
+        row[i] = self.diag[i]
+        return row
+
+    def __len__(self):
+        return self.N
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self.to_dense()
+        return matrix if dtype is None else matrix.astype(dtype)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(N={self.N}, nnz={self.nnz})"
+
+
+class DenseLinks(Links):
+    """Matrix (N, N) of links, the historical representation of syst_links.
+    data is a flat view of the matrix so the modifications are shared with it."""
+
+    format = 'dense'
+
+    def __init__(self, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype=float)
+        N = matrix.shape[0]
+        super().__init__(N, matrix.reshape(-1), matrix.diagonal())
+        self.matrix = matrix
+
+    @property
+    def nnz(self):
+        return int(np.count_nonzero(self.matrix)) - int(np.count_nonzero(self.diag))
+
+    def matvec(self, x):
+        # the diagonal is taken out of the product, the matrix is never written (it can be
+        # shared with a copy read by another thread)
+        return self.matrix @ x - self.diag * x
+
+    def row_index(self, i):
+        return np.delete(np.arange(i * self.N, (i + 1) * self.N), i)
+
+    def column_index(self, j):
+        return np.delete(np.arange(j, self.N * self.N, self.N), j)
+
+    def row_positions(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        positions = (rows[:, None] * self.N + np.arange(self.N)).ravel()
+        # the diagonal is at the positions i * (N + 1)
+        return positions[positions % (self.N + 1) != 0]
+
+    def gather_columns(self, cols):
+        rows, k = np.nonzero(self.matrix[:, cols])
+        senders = np.asarray(cols)[k]
+        keep = rows != senders
+        rows, senders = rows[keep], senders[keep]
+        return rows, senders, self.matrix[rows, senders]
+
+    def locate(self, positions):
+        return np.divmod(positions, self.N)
+
+    def to_coo(self):
+        matrix = self.matrix.copy()
+        np.fill_diagonal(matrix, 0.0)
+        rows, cols = np.nonzero(matrix)
+        return rows, cols, matrix[rows, cols]
+
+    def to_dense(self):
+        return self.matrix.copy()
+
+    def to_arrays(self):
+        return {'format': self.format, 'matrix': self.matrix}
+
+    def __getitem__(self, i):
+        return self.matrix[i]
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is not None:
+            return self.matrix.astype(dtype)
+        return self.matrix.copy() if copy else self.matrix
+
+
+class _CompressedLinks(Links):
+    """Common part of CSRLinks and CSCLinks: the links are sorted by a major axis
+    (rows for CSR, columns for CSC). The links of the major index k are
+    data[indptr[k]:indptr[k+1]] and indices gives their index on the minor axis."""
+
+    def __init__(self, N, indptr, indices, data, diag):
+        super().__init__(N, np.asarray(data, dtype=float), np.asarray(diag, dtype=float).copy())
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        # major index of each stored link, used to compute the products in O(nnz)
+        self._major = np.repeat(np.arange(N), np.diff(self.indptr))
+        self._minor_order = None
+        self._minor_ptr = None
+
+    @classmethod
+    def from_coo(cls, N, rows, cols, values, diag):
+        """Build the store from the coordinates of the links, the diagonal and the zeros are dropped."""
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        if np.isscalar(diag) or np.ndim(diag) == 0:
+            diag = np.full(N, diag, dtype=float)
+        keep = (rows != cols) & (values != 0)
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+        major, minor = cls._axes(rows, cols)
+        order = np.lexsort((minor, major))
+        indptr = np.zeros(N + 1, dtype=np.int64)
+        np.cumsum(np.bincount(major, minlength=N), out=indptr[1:])
+        return cls(N, indptr, minor[order], values[order], diag)
+
+    @classmethod
+    def from_dense(cls, matrix):
+        matrix = np.asarray(matrix, dtype=float)
+        rows, cols = np.nonzero(matrix)
+        return cls.from_coo(matrix.shape[0], rows, cols, matrix[rows, cols], matrix.diagonal())
+
+    @staticmethod
+    @abstractmethod
+    def _axes(rows, cols):
+        """Return the (major, minor) indices of links given by their rows and columns"""
+
+    def _major_index(self, k):
+        return np.arange(self.indptr[k], self.indptr[k + 1])
+
+    def _major_positions(self, ks):
+        """Positions of the links of all the major indices ks"""
+        ks = np.asarray(ks, dtype=np.int64)
+        return expand_ranges(self.indptr[ks], self.indptr[ks + 1])
+
+    def _minor_positions(self, ks):
+        """Positions of the links of all the minor indices ks. The permutation sorting the links by
+        their minor index is computed at the first call."""
+        if self._minor_order is None:
+            self._minor_order = np.argsort(self.indices, kind='stable')
+            self._minor_ptr = np.zeros(self.N + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=self.N), out=self._minor_ptr[1:])
+        ks = np.asarray(ks, dtype=np.int64)
+        return self._minor_order[expand_ranges(self._minor_ptr[ks], self._minor_ptr[ks + 1])]
+
+    def _minor_index(self, k):
+        return self._minor_positions([k])
+
+    def locate(self, positions):
+        return self._axes(self._major[positions], self.indices[positions])
+
+    def to_coo(self):
+        keep = self.data != 0
+        major, minor = self._major[keep], self.indices[keep]
+        rows, cols = self._axes(major, minor)
+        return rows, cols, self.data[keep]
+
+    def to_arrays(self):
+        return {'format': self.format, 'N': self.N, 'indptr': self.indptr, 'indices': self.indices,
+                'data': self.data, 'diag': self.diag}
+
+
+class CSRLinks(_CompressedLinks):
+    """Sparse store of the links sorted by row: the links received by the neuron i are
+    data[indptr[i]:indptr[i+1]] and come from the neurons indices[indptr[i]:indptr[i+1]]."""
+
+    format = 'csr'
+
+    @staticmethod
+    def _axes(rows, cols):
+        return rows, cols
+
+    def matvec(self, x):
+        return np.bincount(self._major, weights=self.data * x[self.indices], minlength=self.N)
+
+    def row_index(self, i):
+        return self._major_index(i)
+
+    def column_index(self, j):
+        return self._minor_index(j)
+
+    def row_positions(self, rows):
+        return self._major_positions(rows)
+
+    def gather_columns(self, cols):
+        index = self._minor_positions(cols)
+        return self._major[index], self.indices[index], self.data[index]
+
+    def _other_end(self, index):
+        return self.indices[index]
+
+
+class CSCLinks(_CompressedLinks):
+    """Sparse store of the links sorted by column: the links sent by the neuron j are
+    data[indptr[j]:indptr[j+1]] and go to the neurons indices[indptr[j]:indptr[j+1]]."""
+
+    format = 'csc'
+
+    @staticmethod
+    def _axes(rows, cols):
+        return cols, rows
+
+    def matvec(self, x):
+        return np.bincount(self.indices, weights=self.data * x[self._major], minlength=self.N)
+
+    def row_index(self, i):
+        return self._minor_index(i)
+
+    def column_index(self, j):
+        return self._major_index(j)
+
+    def row_positions(self, rows):
+        return self._minor_positions(rows)
+
+    def gather_columns(self, cols):
+        index = self._major_positions(cols)
+        return self.indices[index], self._major[index], self.data[index]
+
+    def _other_end(self, index):
+        return self._major[index]
+
+
+LINKS_FORMATS = {'dense': DenseLinks, 'csr': CSRLinks, 'csc': CSCLinks}
+
+
+def as_links(links, fmt='dense'):
+    """Return links as a store of the format fmt. links can be a store of any format,
+    a numpy matrix (N, N) or a list of lists like the old syst_links."""
+    if fmt not in LINKS_FORMATS:
+        raise ValueError(f"Unknown format of links {fmt}, expected one of {list(LINKS_FORMATS)}")
+    if isinstance(links, Links):
+        return links.asformat(fmt)
+    if fmt == 'dense':
+        return DenseLinks(links)
+    return LINKS_FORMATS[fmt].from_dense(links)
+
+
+def links_from_arrays(arrays):
+    """Rebuild a store from the arrays given by its method to_arrays"""
+    fmt = str(arrays['format'])
+    if fmt == 'dense':
+        return DenseLinks(np.array(arrays['matrix']))
+    return LINKS_FORMATS[fmt](int(arrays['N']), arrays['indptr'], arrays['indices'],
+                              np.array(arrays['data']), arrays['diag'])
@@ -0,0 +1,103 @@
+import numpy as np
+from py_project.weighted_model import WeightedModel
+from py_project.potential_decrease_model import PotentialDecreaseModel
+from py_project.stimulus import make_rng
+
+
+class EnsembleModel:
+    """Simulate K independent replicas of the same network configuration at once.
+
+    To get statistics on a model, we run a lot of replicas of the same configuration
+    (same class, N, beta, gamma, ca) built with different seeds. Instead of stepping
+    K models one after the other, the ensemble stacks their data:
+        potentials: matrix (K, N), potentials[k] is the syst_potential of the replica k
+        states: matrix (K, N), states[k] is the syst_state of the replica k
+        links: matrix (K, N, N), links[k] is the syst_links of the replica k without its diagonal
+        diag: matrix (K, N), the diagonal of the links of each replica
+    and advances all the replicas with one batched matrix product per step.
+
+    The replicas follow the rules of the class of the models given (SimplifiedModel,
+    WeightedModel or PsychoactiveModel). PotentialDecreaseModel is not supported as its
+    neurons carry their own phase."""
+
+    def __init__(self, models, seed=None):
+        if len(models) == 0:
+            raise ValueError("The ensemble needs at least one model")
+        self.template = models[0]
+        if isinstance(self.template, PotentialDecreaseModel):
+            raise ValueError("PotentialDecreaseModel can not be simulated in an ensemble")
+        for model in models:
+            if type(model) is not type(self.template) or model.N != self.template.N:
+                raise ValueError("All the models of an ensemble must have the same class and size")
+        self.K = len(models)
+        self.N = self.template.N
+        self.beta = self.template.beta
+        self.links = np.stack([np.array(model.syst_links) for model in models])
+        self.diag = np.stack([model.syst_links.diag for model in models])
+        self.links[:, np.arange(self.N), np.arange(self.N)] = 0.0
+        self.potentials = np.stack([model.syst_potential for model in models]).astype(float)
+        self.states = np.stack([model.syst_state for model in models]).astype(int)
+        # the kick-offs of all the replicas are drawn at once with the stimulus of the models
+        self.stimulus = self.template.stimulus
+        self.rng = make_rng(seed)
+
+    @classmethod
+    def from_seeds(cls, model_class, seeds, *args, **kwargs):
+        """Build an ensemble of len(seeds) replicas of model_class(*args, **kwargs), the
+        replica k being created with seed=seeds[k]. The generator of the ensemble is seeded
+        with all the seeds, the global random state is not used."""
+        seeds = list(seeds)
+        models = [model_class(*args, seed=seed, **kwargs) for seed in seeds]
+        return cls(models, seed=seeds)
+
+    def non_transmittable(self):
+        """Return a vector of bool of size K, True for the replicas where no neuron can
+        transmit signal to others"""
+        return ~self.states.any(axis=1)
+
+    def start_syst(self, replicas):
+        """Send in the information to kick off the replicas given (boolean mask or indices),
+        like the start_syst of the class of the models."""
+        added = self.stimulus(self.rng, self.potentials[replicas].shape)
+        potentials = self.template.func_act_vect(self.potentials[replicas] + added)
+        if isinstance(self.template, WeightedModel):
+            states = (potentials == WeightedModel.Vmax).astype(int)
+        else:
+            states = (potentials >= self.template.threshold).astype(int)
+        self.potentials[replicas] = potentials
+        self.states[replicas] = states
+
+    def update_system_one_step(self):
+        """Calculate the potentials and the states of all the neurons of all the replicas
+        at the time t+1, see SimplifiedModel.update_system_one_step"""
+        sent = self.potentials * self.states
+        kept = self.potentials * (1 - self.states)
+        received = np.matmul(self.links, sent[:, :, None])[:, :, 0] + self.diag * kept
+        self.potentials = self.template.func_act_vect(self.beta * received)
+        self.states = (self.potentials >= self.template.threshold).astype(int)
+
+    def simulation(self, nb_steps: int):
+        """Same as the simulation of the models for all the replicas at once: at each step,
+        the replicas which can not transmit are kicked off and the others updated.
+        Yield the matrixes (K, N) of states and potentials, row k for the replica k"""
+        for i in range(nb_steps):
+            dead = self.non_transmittable()
+            if dead.all():
+                self.start_syst(dead)
+            else:
+                potentials, states = self.potentials, self.states
+                self.update_system_one_step()
+                if dead.any():
+                    self.potentials[dead], self.states[dead] = potentials[dead], states[dead]
+                    self.start_syst(dead)
+            yield (self.states.copy(), self.potentials.copy())
+
+
+if __name__ == '__main__':
+    from py_project.psychoactive_model import PsychoactiveModel
+
+    ensemble = EnsembleModel.from_seeds(PsychoactiveModel, range(50), 200, 0.3, 0.9, 0.2)
+    activity = np.zeros(ensemble.K)
+    for states, potentials in ensemble.simulation(100):
+        activity += states.mean(axis=1)
+    print("Mean activity rate of each replica:\n", activity / 100)
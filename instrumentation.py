@@ -0,0 +1,102 @@
+import json
+import os
+import time
+
+import numpy as np
+
+
+class StepProfiler:
+    """Opt-in profiler of the steps of a model.
+
+    A model has no profiler by default (model.profiler is None) and then only pays a test
+    `is not None` at a few points of its step. Once a profiler is attached:
+        model.profiler = StepProfiler(trace=True)
+        for _ in model.simulation(1000): pass
+        print(model.profiler.summary())
+        model.profiler.export_trace('profile.json')
+    each step records the time spent in its sections:
+        receive: the sum of the potentials received from the other neurons
+        activation: the activate functions (func_act, func_act_0...func_act_4)
+        transition: the update of the states, phases, lamb and time_rest
+    and each kick-off (start_syst, start_syst_1) is counted and timed. After each step, the
+    number of active neurons and the number of neurons in each phase are counted.
+
+    summary() gives the totals and means of each section, export_trace() writes the steps
+    in the Trace Event Format (chrome://tracing, Perfetto) to be loaded with other profiles."""
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.nb_steps = 0
+        self.sections = {}
+        self.kicks = {}
+        self.nb_active = []
+        self.phase_counts = []
+        self.events = []
+        self._origin = self.clock()
+        self._step_start = None
+        self._mark = None
+
+    def _add(self, table, name, start, end):
+        duration = end - start
+        total, count, maxi = table.get(name, (0., 0, 0.))
+        table[name] = (total + duration, count + 1, max(maxi, duration))
+        if self.trace:
+            self.events.append({'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                                'ts': (start - self._origin) * 1e6, 'dur': duration * 1e6})
+
+    def begin_step(self):
+        """Mark the start of a step"""
+        self._step_start = self._mark = self.clock()
+
+    def lap(self, name):
+        """Record the time spent in the section name since the last mark"""
+        now = self.clock()
+        self._add(self.sections, name, self._mark, now)
+        self._mark = now
+
+    def end_step(self, syst_state, phase=None):
+        """Mark the end of a step and count the active neurons and the neurons in each phase"""
+        now = self.clock()
+        self._add(self.sections, 'step', self._step_start, now)
+        self.nb_steps += 1
+        self.nb_active.append(int(np.count_nonzero(syst_state)))
+        if phase is not None:
+            self.phase_counts.append(np.bincount(np.asarray(phase, dtype=int), minlength=5))
+
+    def kick(self, name, start):
+        """Record a kick-off of the system by the function name which started at the time start"""
+        self._add(self.kicks, name, start, self.clock())
+
+    def summary(self):
+        """Return a dict of the total, mean and max duration (in seconds) and number of calls of each
+        section and kick-off, the mean number of active neurons and of neurons in each phase"""
+        def table(entries):
+            return {name: {'total_s': total, 'count': count, 'mean_s': total / count, 'max_s': maxi}
+                    for name, (total, count, maxi) in entries.items()}
+        res = {'nb_steps': self.nb_steps, 'sections': table(self.sections), 'kicks': table(self.kicks)}
+        if self.nb_active:
+            res['mean_active'] = float(np.mean(self.nb_active))
+        if self.phase_counts:
+            res['mean_phase_counts'] = np.mean(self.phase_counts, axis=0).tolist()
+        return res
+
+    def export_summary(self, path):
+        """Write the summary into a json file"""
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=1)
+
+    def export_trace(self, path):
+        """Write the sections recorded (trace=True) in the Trace Event Format into a json file,
+        with the number of active neurons and of neurons per phase as counters"""
+        events = list(self.events)
+        steps = [event for event in events if event['name'] == 'step']
+        for k, event in enumerate(steps):
+            counters = {'active': self.nb_active[k]}
+            if k < len(self.phase_counts):
+                counters.update({f'phase {p}': int(n) for p, n in enumerate(self.phase_counts[k])})
+            events.append({'name': 'neurons', 'ph': 'C', 'pid': event['pid'], 'tid': 0,
+                           'ts': event['ts'] + event['dur'], 'args': counters})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
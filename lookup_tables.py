@@ -0,0 +1,127 @@
+import numpy as np
+
+# tables already built, by (class of model, gamma, deltaT, max_error)
+_TABLES = {}
+
+
+class ActivationTables:
+    """Interpolated tables of the functions that call an exponential in the step of a
+    PotentialDecreaseModel:
+        func_act_0: the potential is in [Vmin_ma, threshold] (func_act_0 is constant outside)
+        exp(gamma * (1 - lamb)) with lamb in [0, 1], used by func_act_3, func_act_4,
+        update_lamb and give_time_ar
+    The nodes of a table are evenly spaced, so the interval of a value is found by a division and
+    the value is linearly interpolated between the two nodes: a few multiplications and a
+    lookup in an array instead of an exponential. Beyond the bounds the exact
+    values are used: the clamps of func_act_0, np.exp for a lamb outside of [0, 1].
+
+    The tables are checked against the exact functions of the model (the model given has no
+    tables while they are built) at the middle of the nodes, where the interpolation is the least
+    precise, and at random points. They are refined (twice as many nodes) until the error on
+    func_act_0, func_act_3, func_act_4, update_lamb and give_time_ar is below max_error.
+    Use activation_tables() to build them only once for each (gamma, deltaT)."""
+
+    def __init__(self, model, max_error=1e-6, max_nodes=2 ** 22):
+        self.gamma = model.gamma
+        self.deltaT = model.deltaT
+        self.max_error = max_error
+        self.threshold = model.threshold
+        self.Vmin_ma = model.Vmin_ma
+        previous, model.tables = model.tables, None
+        try:
+            nb_nodes = 257
+            while True:
+                self._build(model, nb_nodes)
+                self.error = self.validate(model)
+                if self.error <= max_error:
+                    break
+                nb_nodes = 2 * nb_nodes - 1
+                if nb_nodes > max_nodes:
+                    raise ValueError(f"Tables of {max_nodes} nodes don't reach the error {max_error} "
+                                     f"(error {self.error})")
+        finally:
+            model.tables = previous
+        self.nb_nodes = nb_nodes
+
+    def _build(self, model, nb_nodes):
+        # the last nodes are just inside the interval, func_act_0 is clamped on the bounds
+        self._pos_nodes = np.linspace(0., np.nextafter(self.threshold, 0.), nb_nodes)
+        self._neg_nodes = np.linspace(np.nextafter(self.Vmin_ma, 0.), 0., nb_nodes)
+        self._lamb_nodes = np.linspace(0., 1., nb_nodes)
+        self._pos = self._table(self._pos_nodes, model.func_act_0_vect(self._pos_nodes))
+        self._neg = self._table(self._neg_nodes, model.func_act_0_vect(self._neg_nodes))
+        self._exp = self._table(self._lamb_nodes, np.exp(self.gamma * (1 - self._lamb_nodes)))
+
+    @staticmethod
+    def _table(nodes, values):
+        """Return what interpolate needs: first node, inverse of the spacing, values and slopes"""
+        return nodes[0], (len(nodes) - 1) / (nodes[-1] - nodes[0]), values[:-1], np.diff(values)
+
+    @staticmethod
+    def interpolate(x, table):
+        """array * tuple -> array
+        Linear interpolation of the table at the points x. The points out of the table are
+        extrapolated from the first or last interval, the callers replace them by exact values."""
+        first, inv_step, values, slopes = table
+        position = (x - first) * inv_step
+        k = position.astype(np.intp)
+        return values.take(k, mode='clip') + (position - k) * slopes.take(k, mode='clip')
+
+    def func_act_0(self, potentiel):
+        """array -> array
+        func_act_0_vect of the model, interpolated"""
+        V_new = np.empty_like(potentiel)
+        neg = potentiel < 0
+        V_new[neg] = self.interpolate(potentiel[neg], self._neg)
+        V_new[~neg] = self.interpolate(potentiel[~neg], self._pos)
+        V_new[potentiel >= self.threshold] = self.threshold
+        V_new[potentiel <= self.Vmin_ma] = self.Vmin_ma
+        return V_new
+
+    def exp_lamb(self, lamb):
+        """array -> array
+        exp(gamma * (1 - lamb)), interpolated for lamb in [0, 1]"""
+        res = self.interpolate(lamb, self._exp)
+        outside = (lamb < 0) | (lamb > 1)
+        if outside.any():
+            res[outside] = np.exp(self.gamma * (1 - lamb[outside]))
+        return res
+
+    def validate(self, model, nb_points=100000, seed=0):
+        """Return the maximal absolute difference between the functions of the model computed
+        exactly and with these tables"""
+        rng = np.random.default_rng(seed)
+
+        def middles(nodes):
+            return (nodes[1:] + nodes[:-1]) / 2
+
+        potentiel = np.concatenate((middles(self._neg_nodes), middles(self._pos_nodes),
+                                    rng.uniform(self.Vmin_ma, self.threshold, nb_points)))
+        lamb = np.concatenate((middles(self._lamb_nodes), rng.uniform(0., 1., nb_points)))
+        potentiel_lamb = rng.uniform(self.Vmin_ma, self.threshold, len(lamb))
+        time_rest = rng.uniform(0., 1., len(lamb)) * model.give_time_ar_vect(np.zeros(1))
+
+        def evaluate():
+            return (model.func_act_0_vect(potentiel),
+                    model.func_act_3_vect(potentiel_lamb, lamb),
+                    model.func_act_4_vect(potentiel_lamb, lamb),
+                    model.update_lamb_vect(lamb, time_rest),
+                    model.give_time_ar_vect(lamb))
+
+        tables, model.tables = model.tables, None
+        try:
+            exact = evaluate()
+            model.tables = self
+            approx = evaluate()
+        finally:
+            model.tables = tables
+        return max(float(np.max(np.abs(x - y))) for x, y in zip(exact, approx))
+
+
+def activation_tables(model, max_error=1e-6):
+    """Return the ActivationTables of the parameters gamma and deltaT of the model, built at
+    the first call only"""
+    key = (type(model), model.gamma, model.deltaT, max_error)
+    if key not in _TABLES:
+        _TABLES[key] = ActivationTables(model, max_error)
+    return _TABLES[key]
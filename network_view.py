@@ -0,0 +1,235 @@
+import numpy as np
+from matplotlib.colors import to_rgba_array, LinearSegmentedColormap, TwoSlopeNorm
+from matplotlib.image import AxesImage
+
+MIN_SCATTER_SIZE = 50
+MAX_SCATTER_POINTS = 5000  # beyond, NetworkMap shows the density of the neurons
+# colors of the neurons: green (potential >= 0), blue (potential < 0), red (active)
+STATE_COLORS = to_rgba_array(['green', 'blue', 'red'])
+
+
+def state_colors(state, potential):
+    """array(N,) * array(N,) -> array(N, 4)
+    Return the RGBA colors of the neurons: red if the neuron is active, otherwise green if
+    its potential is >= 0 and blue if it is negative. Picked in STATE_COLORS in one call instead
+    of building a list of names neuron by neuron."""
+    potential = np.asarray(potential)
+    return STATE_COLORS[np.where(np.asarray(state) == 1, 2, potential < 0)]
+
+
+def scatter_sizes(potential, min_size=MIN_SCATTER_SIZE):
+    """array(N,) -> array(N,)
+    Return the sizes of the points of the neurons, bigger for a bigger |potential|"""
+    return np.abs(potential) + min_size
+
+
+class NetworkScatter:
+    """Scatter of the neurons of a network, created once and updated in place at each frame:
+    only the sizes and colors of its points change (set_coords when the neurons move or their
+    number changes). The artist is animated, it is drawn by a Blitter and not by canvas.draw."""
+
+    def __init__(self, ax, coord_X, coord_Y, min_size=MIN_SCATTER_SIZE):
+        self.min_size = min_size
+        self.artist = ax.scatter(coord_X, coord_Y, s=min_size, lw=0.5, c=[STATE_COLORS[0]],
+                                 edgecolors='face', animated=True)
+
+    def set_coords(self, coord_X, coord_Y):
+        self.artist.set_offsets(np.column_stack((coord_X, coord_Y)))
+
+    def update(self, state, potential):
+        """Show the state and potential of the neurons, return the artists changed"""
+        self.artist.set_sizes(scatter_sizes(potential, self.min_size))
+        self.artist.set_facecolor(state_colors(state, potential))
+        return self.artist,
+
+
+class DensityImage:
+    """Neurons of a network aggregated in a grid of bins x bins cells covering the limits of
+    the axes: the mean potential of the neurons of each cell is shown as an image (blue below
+    0, green above, like the points of the scatter), and the fraction of active neurons of the
+    cell as red over it. The cell of each neuron is computed only when the neurons or the limits
+    of the axes (zoom) change, then each frame is a few np.bincount over the neurons, whatever
+    their number. The cells without neuron are transparent."""
+
+    def __init__(self, ax, bins=64, vmin=-30., vmax=120.):
+        self.ax = ax
+        self.bins = bins
+        cmap = LinearSegmentedColormap.from_list('potential', ['blue', 'white', 'green'])
+        cmap.set_bad(alpha=0.)
+        norm = TwoSlopeNorm(0., vmin, vmax)
+        # images added without imshow, which would change the limits of the axes
+        self.potential = AxesImage(ax, cmap=cmap, norm=norm, origin='lower', interpolation='nearest',
+                                   animated=True)
+        self.active = AxesImage(ax, origin='lower', interpolation='nearest', animated=True)
+        for image in self.artists:
+            image.set_data(np.zeros((bins, bins, 4)))
+            ax.add_image(image)
+        self._color_active = np.zeros((bins, bins, 4))
+        self._color_active[..., :3] = to_rgba_array(['red'])[0, :3]
+        self.coord_X = self.coord_Y = np.zeros(0)
+        self._limits = None
+        self.inside = np.zeros(0, dtype=np.intp)
+        self.nb_visible = 0
+
+    @property
+    def artists(self):
+        return [self.potential, self.active]
+
+    def set_coords(self, coord_X, coord_Y):
+        self.coord_X = np.asarray(coord_X, dtype=float)
+        self.coord_Y = np.asarray(coord_Y, dtype=float)
+        self._limits = None
+
+    def _bin(self):
+        """Compute the cell of each neuron visible in the limits of the axes"""
+        (x0, x1), (y0, y1) = self._limits = self.ax.get_xlim(), self.ax.get_ylim()
+        inside = (self.coord_X >= x0) & (self.coord_X <= x1) & (self.coord_Y >= y0) & (self.coord_Y <= y1)
+        # indices of the neurons visible, a new array each time the limits change
+        self.inside = np.flatnonzero(inside)
+        # the neurons on the upper limits belong to the last cells
+        cell_X = np.minimum((self.coord_X[inside] - x0) / (x1 - x0) * self.bins, self.bins - 1).astype(np.intp)
+        cell_Y = np.minimum((self.coord_Y[inside] - y0) / (y1 - y0) * self.bins, self.bins - 1).astype(np.intp)
+        self._cells = cell_Y * self.bins + cell_X
+        self._counts = np.bincount(self._cells, minlength=self.bins ** 2).astype(float)
+        self.nb_visible = len(self.inside)
+        for image in self.artists:
+            image.set_extent((x0, x1, y0, y1))
+
+    def visible(self):
+        """Return the number of neurons in the limits of the axes"""
+        if self._limits != (self.ax.get_xlim(), self.ax.get_ylim()):
+            self._bin()
+        return self.nb_visible
+
+    def update(self, state, potential):
+        """Show the state and potential of the neurons, return the artists changed"""
+        self.visible()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(self._cells, weights=np.asarray(potential, dtype=float)[self.inside],
+                               minlength=self.bins ** 2) / self._counts
+            active = np.bincount(self._cells, weights=np.asarray(state, dtype=float)[self.inside],
+                                 minlength=self.bins ** 2) / self._counts
+        self.potential.set_data(np.ma.masked_invalid(mean.reshape(self.bins, self.bins)))
+        self._color_active[..., 3] = np.nan_to_num(active).reshape(self.bins, self.bins)
+        self.active.set_data(self._color_active)
+        return self.artists
+
+
+class NetworkMap:
+    """Map of a network which chooses its level of detail: each neuron is drawn (NetworkScatter)
+    while at most max_points neurons are in the limits of the axes, beyond only their density
+    is drawn (DensityImage). It depends on N and on the zoom: zooming into a big network shows
+    its neurons again, and the scatter only gets the neurons visible."""
+
+    def __init__(self, ax, coord_X, coord_Y, min_size=MIN_SCATTER_SIZE, max_points=MAX_SCATTER_POINTS,
+                 bins=64, vmin=-30., vmax=120.):
+        self.max_points = max_points
+        self.scatter = NetworkScatter(ax, [], [], min_size)
+        self.density = DensityImage(ax, bins, vmin, vmax)
+        self.set_coords(coord_X, coord_Y)
+
+    @property
+    def artists(self):
+        return [self.scatter.artist] + self.density.artists
+
+    def set_coords(self, coord_X, coord_Y):
+        self.density.set_coords(coord_X, coord_Y)
+        self._shown = None
+
+    def update(self, state, potential):
+        """Show the state and potential of the neurons in the mode fitting the number of neurons
+        visible, return the artists drawn"""
+        dense = self.density.visible() > self.max_points
+        self.scatter.artist.set_visible(not dense)
+        for image in self.density.artists:
+            image.set_visible(dense)
+        if dense:
+            return self.density.update(state, potential)
+        shown = self.density.inside
+        if self._shown is not shown:
+            self._shown = shown
+            self.scatter.set_coords(self.density.coord_X[shown], self.density.coord_Y[shown])
+        return self.scatter.update(np.asarray(state)[shown], np.asarray(potential)[shown])
+
+
+class Blitter:
+    """Draw the animated artists of the axes ax without drawing the whole figure again: the
+    background of the axes (everything but these artists) is saved when the canvas is fully
+    drawn (first show, resize, zoom) and each frame only copies it back, draws the artists and
+    blits the box of the axes.
+        blitter = Blitter(canvas, ax, [scatter.artist])
+        scatter.update(state, potential)
+        blitter.update()"""
+
+    def __init__(self, canvas, ax, artists=()):
+        self.canvas = canvas
+        self.ax = ax
+        self.artists = list(artists)
+        self._background = None
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add(self, artist):
+        artist.set_animated(True)
+        self.artists.append(artist)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        if self.ax.get_visible():
+            self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            if artist.get_visible():
+                self.ax.draw_artist(artist)
+
+    def update(self):
+        """Draw the artists in their current state (nothing if the axes are hidden)"""
+        if not self.ax.get_visible():
+            return
+        if self._background is None:
+            # the background is saved by the full draw (_on_draw), which also draws the artists
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.ax.bbox)
+        self.canvas.flush_events()
+
+
+class ActivityLines:
+    """Lines of the number of active neurons and of the neurons in each phase over the last
+    length steps (see ActivityHistory), created once: each frame only gives them the series.
+    The steps are drawn relatively to the last one (0 on the right) and the axes only change
+    with N (set_scale), so the lines are blitted like the scatter."""
+
+    def __init__(self, ax, length, nb_phases=0):
+        self.ax = ax
+        self.active, = ax.plot([], [], color='red', lw=1.5, label='active', animated=True)
+        self.phases = [ax.plot([], [], lw=0.8, label=f'phase {p}', animated=True)[0]
+                       for p in range(nb_phases)]
+        ax.set_xlim(-length, 0)
+        ax.set_xlabel('steps')
+        ax.set_ylabel('neurons')
+        self.show_phases(False)
+
+    @property
+    def artists(self):
+        return [self.active] + self.phases
+
+    def set_scale(self, N):
+        """Scale the axes to N neurons, the canvas has to be drawn again"""
+        self.ax.set_ylim(0, N)
+
+    def show_phases(self, visible):
+        """Show or hide the lines of the phases (only the models with phases have them)"""
+        for line in self.phases:
+            line.set_visible(visible)
+        self.ax.legend(handles=[line for line in self.artists if line.get_visible()], loc='upper left')
+
+    def update(self, steps, nb_active, phase_counts):
+        """Show the series of an ActivityHistory, return the artists changed"""
+        x = steps - steps[-1] if len(steps) else steps
+        self.active.set_data(x, nb_active)
+        for p, line in enumerate(self.phases[:phase_counts.shape[1]]):
+            line.set_data(x, phase_counts[:, p])
+        return self.artists
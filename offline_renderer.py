@@ -0,0 +1,222 @@
+"""Render a run into numbered images or a video, offline and in parallel.
+
+    python -m py_project.offline_renderer run --output frames
+    python -m py_project.offline_renderer run --video run.mp4 --fps 25
+    python -m py_project.offline_renderer --model potential_decrease --N 2000 --steps 5000 --video run.mp4
+
+The frames of a trajectory recorded by TrajectoryRecorder (the directory run) are drawn like
+visualize_model.py does (see network_view.NetworkMap) but without a window: each process of a
+pool opens the trajectory (memory mapped, nothing is sent to it but frame numbers), draws its
+frames on its own Agg figure and writes them as frame_000000.png... With --video, the frames
+are piped in order to ffmpeg if it is installed, otherwise they are written as images.
+With --model, the model is first simulated headless and recorded in the directory given (or a
+temporary directory). The time of rendering goes down with the number of cores, not with the pace of the
+simulation."""
+import argparse
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from py_project.network_view import NetworkMap, MIN_SCATTER_SIZE, MAX_SCATTER_POINTS
+from py_project.parameter_sweep import MODELS, PARAMETERS, build_model
+from py_project.trajectory import TrajectoryReader, record_simulation
+
+# number of frames each process renders in advance of ffmpeg in render_video
+FRAMES_AHEAD = 4
+# FrameRenderer of the process, created by _init_worker
+_RENDERER = None
+
+
+class FrameRenderer:
+    """Figure (Agg, without pyplot nor window) of the map of the network of a recorded
+    trajectory, which draws any of its frames"""
+
+    def __init__(self, path, size=7., dpi=100, max_points=MAX_SCATTER_POINTS):
+        self.reader = TrajectoryReader(path)
+        self.fig = Figure(figsize=(size, size), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        ax = self.fig.subplots()
+        ax.set_xlim(0, 1)
+        ax.set_xticks([])
+        ax.set_ylim(0, 1)
+        ax.set_yticks([])
+        coords = self.reader.coords
+        if coords is not None:
+            position = (coords - coords.min(axis=0)) / np.ptp(coords, axis=0).clip(min=1e-9)
+        else:
+            # the same positions in all the processes
+            position = np.random.default_rng(0).uniform(0, 1, (self.reader.N, 2))
+        self.map = NetworkMap(ax, position[:, 0], position[:, 1], MIN_SCATTER_SIZE, max_points)
+        # the whole figure is drawn at each frame, there is no blitting here
+        for artist in self.map.artists:
+            artist.set_animated(False)
+        self.title = ax.set_title('')
+
+    def draw(self, frame):
+        state, potential = self.reader[frame]
+        self.map.update(state, potential)
+        self.title.set_text(f"step {self.reader.step_of(frame)}")
+
+    def rgba(self, frame):
+        """Return the image (height, width, 4) of the frame"""
+        self.draw(frame)
+        self.canvas.draw()
+        return np.array(self.canvas.buffer_rgba())
+
+    def save(self, frame, path):
+        """Write the image of the frame into the file path (png)"""
+        self.draw(frame)
+        self.canvas.print_png(path)
+
+
+def _init_worker(path, options):
+    global _RENDERER
+    _RENDERER = FrameRenderer(path, **options)
+
+
+def _save_frames(task):
+    numbers, frames, pattern = task
+    for number, frame in zip(numbers, frames):
+        _RENDERER.save(frame, pattern % number)
+    return len(frames)
+
+
+def _frame_rgba(frame):
+    return _RENDERER.rgba(frame)
+
+
+def _images_in_order(executor, frames, ahead):
+    """Yield the images of frames in order, at most ahead frames being submitted to the pool and
+    not yet consumed: the images waiting for the encoder are bounded instead of all the frames"""
+    pending = deque()
+    for frame in frames:
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+        pending.append(executor.submit(_frame_rgba, frame))
+    while pending:
+        yield pending.popleft().result()
+
+
+def render_images(path, frames, output, max_workers=None, **options):
+    """Render the frames of the trajectory path in parallel into the directory output as
+    frame_000000.png, frame_000001.png... (numbered in the order of frames, without gap, as
+    encoders expect). Return the number of images written."""
+    os.makedirs(output, exist_ok=True)
+    pattern = os.path.join(output, 'frame_%06d.png')
+    workers = max_workers or os.cpu_count() or 1
+    chunks = np.array_split(np.arange(len(frames)), min(len(frames), 4 * workers) or 1)
+    tasks = [(chunk.tolist(), [frames[k] for k in chunk], pattern) for chunk in chunks]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(path, options)) as executor:
+        return sum(executor.map(_save_frames, tasks))
+
+
+def render_video(path, frames, video, fps=25, max_workers=None, ffmpeg=None, **options):
+    """Render the frames of the trajectory path in parallel and pipe them in order to ffmpeg,
+    which encodes the file video. Each process renders at most FRAMES_AHEAD frames in advance of
+    the encoder. Return the number of frames encoded."""
+    ffmpeg = ffmpeg or shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is not installed")
+    workers = max_workers or os.cpu_count() or 1
+    encoder = None
+    nb_frames = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(path, options)) as executor:
+        for image in _images_in_order(executor, frames, FRAMES_AHEAD * workers):
+            if encoder is None:
+                height, width = image.shape[:2]
+                encoder = subprocess.Popen(
+                    [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                     '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+                     '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', video],
+                    stdin=subprocess.PIPE)
+            encoder.stdin.write(image.tobytes())
+            nb_frames += 1
+    if encoder is not None:
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {video}")
+    return nb_frames
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render a recorded or headless run into images or a video.")
+    parser.add_argument('trajectory', nargs='?', help="directory of a recorded trajectory "
+                                                      "(where the run is recorded with --model)")
+    parser.add_argument('--model', choices=list(MODELS), help="simulate a new model instead of rendering a recording")
+    parser.add_argument('--N', type=int, default=200, help="number of neurons")
+    for name, default in PARAMETERS.items():
+        parser.add_argument('--' + name, type=float, default=default,
+                            help=f"parameter {name} of the model (default {default})")
+    parser.add_argument('--links-format', choices=['dense', 'csr', 'csc'], default='dense',
+                        help="format of the store of links")
+    parser.add_argument('--steps', type=int, default=1000, help="number of steps of simulation")
+    parser.add_argument('--decimation', type=int, default=1, help="record one frame every k steps")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the model (network and kick-offs)")
+    parser.add_argument('--output', default='frames', help="directory of the images")
+    parser.add_argument('--video', help="video file encoded by ffmpeg (images are written if it is not installed)")
+    parser.add_argument('--fps', type=float, default=25, help="frames per second of the video")
+    parser.add_argument('--start', type=int, default=0, help="first frame rendered")
+    parser.add_argument('--stop', type=int, default=None, help="frame where the rendering stops")
+    parser.add_argument('--every', type=int, default=1, help="render one frame every k frames")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (all the cores by default)")
+    parser.add_argument('--size', type=float, default=7., help="size of the images in inches")
+    parser.add_argument('--dpi', type=int, default=100, help="dots per inch of the images")
+    parser.add_argument('--max-points', type=int, default=MAX_SCATTER_POINTS,
+                        help="beyond this number of neurons, their density is drawn instead")
+    args = parser.parse_args(argv)
+    if args.trajectory is None and args.model is None:
+        parser.error("a trajectory or --model is needed")
+    return args
+
+
+def simulate(args, path):
+    """Simulate the model described by args headless and record it in the directory path"""
+    model, coords = build_model(args.model, args.N, args.beta, args.gamma, args.ca, args.dist,
+                                args.deltaT, args.links_format, seed=args.seed)
+    model.verbose = False
+    return record_simulation(model, path, args.steps, args.decimation, coords=coords)
+
+
+def run(args):
+    """Render the run described by args, return the number of frames rendered"""
+    with contextlib.ExitStack() as stack:
+        path = args.trajectory
+        if args.model:
+            if path is None:
+                path = stack.enter_context(tempfile.TemporaryDirectory())
+            simulate(args, path)
+        reader = TrajectoryReader(path)
+        frames = list(range(args.start, len(reader) if args.stop is None else min(args.stop, len(reader)),
+                            args.every))
+        options = {'size': args.size, 'dpi': args.dpi, 'max_points': args.max_points}
+        start = time.perf_counter()
+        if args.video and shutil.which('ffmpeg'):
+            nb_frames = render_video(path, frames, args.video, args.fps, args.workers, **options)
+            target = args.video
+        else:
+            if args.video:
+                print(f"ffmpeg is not installed, the frames are written in {args.output}", file=sys.stderr)
+            nb_frames = render_images(path, frames, args.output, args.workers, **options)
+            target = args.output
+    elapsed = time.perf_counter() - start
+    print(f"{nb_frames} frames rendered into {target} in {elapsed:.2f} s "
+          f"({nb_frames / max(elapsed, 1e-9):.1f} frames/s)", file=sys.stderr)
+    return nb_frames
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from py_project.simplified_model import SimplifiedModel
+from py_project.weighted_model import WeightedModel
+from py_project.psychoactive_model import PsychoactiveModel
+from py_project.potential_decrease_model import PotentialDecreaseModel
+from py_project.spatial_index import links_within_distance
+from py_project.stimulus import make_rng
+
+MODELS = {
+    'simplified': SimplifiedModel,
+    'weighted': WeightedModel,
+    'psychoactive': PsychoactiveModel,
+    'potential_decrease': PotentialDecreaseModel,
+}
+
+# parameters that can be swept, with their value when they are not given
+PARAMETERS = {'beta': 0.3, 'gamma': 0.9, 'ca': 0.0, 'dist': np.nan, 'deltaT': 0.05}
+
+RESULT_FIELDS = [('model', 'U20'), ('N', 'i8'), ('beta', 'f8'), ('gamma', 'f8'), ('ca', 'f8'),
+                 ('dist', 'f8'), ('deltaT', 'f8'), ('seed', 'i8'), ('activity_rate', 'f8'),
+                 ('time_to_death', 'i8'), ('nb_kicks', 'i8'), ('mean_potential', 'f8')]
+
+
+def grid(**values):
+    """Return the list of all the combinations of the values given for each parameter.
+    grid(beta=[0.1, 0.3], gamma=[0.9, 0.95]) -> 4 dicts of parameters"""
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def random_sample(nb_samples, seed=0, **ranges):
+    """Return nb_samples dicts of parameters drawn uniformly in the ranges (low, high) given.
+    random_sample(10, beta=(0.1, 0.6), ca=(-1, 1)) -> 10 dicts of parameters"""
+    rng = np.random.default_rng(seed)
+    samples = {name: rng.uniform(low, high, nb_samples) for name, (low, high) in ranges.items()}
+    return [{name: float(samples[name][k]) for name in ranges} for k in range(nb_samples)]
+
+
+def build_model(model, N, beta, gamma, ca, dist, deltaT, links_format='dense', seed=None):
+    """Create a model of the class named model like the dialog does. If dist is not nan, the
+    neurons are placed randomly in a square of 500x500 and only the neurons within dist of each
+    other can be connected. The coordinates, the links and the model are all drawn from seed
+    (see make_rng), the global random state is not used when a seed is given.
+    Return the model and the matrix (N, 2) of the coordinates of its neurons (None without dist)."""
+    model_class = MODELS[model]
+    rng = make_rng(seed)
+    coords = links = None
+    if not np.isnan(dist):
+        coord_X = rng.integers(0, 501, N)
+        coord_Y = rng.integers(0, 501, N)
+        coords = np.column_stack((coord_X, coord_Y))
+        # given to the constructor, instead of the N x N random links being drawn then replaced
+        links = links_within_distance(coord_X, coord_Y, dist, gamma / beta, fmt=links_format, rng=rng)
+    seed = rng.integers(0, 2 ** 32, size=4)
+    if model_class is PotentialDecreaseModel:
+        network = model_class(N, beta, gamma, ca, deltaT, links_format, links, seed=seed)
+    elif model_class is PsychoactiveModel:
+        network = model_class(N, beta, gamma, ca, links_format, links, seed=seed)
+    else:
+        network = model_class(N, beta, gamma, links_format, links, seed=seed)
+    return network, coords
+
+
+def run_one(task):
+    """dict -> tuple
+    Build and simulate the model described by task then return the row of results.
+    The model is built from task['seed'] so the result of a task doesn't depend on the process
+    running it."""
+    model, coords = build_model(task['model'], task['N'], task['beta'], task['gamma'],
+                                task['ca'], task['dist'], task['deltaT'], seed=task['seed'])
+    # the messages of the kick-offs would flood the output of the sweep
+    model.verbose = False
+    activity, potential = 0., 0.
+    time_to_death = -1
+    for step, (state, syst_potential) in enumerate(model.simulation(task['nb_steps'])):
+        activity += np.mean(state)
+        potential += np.mean(syst_potential)
+        if time_to_death < 0 and model.non_transmittable():
+            time_to_death = step
+    # start_syst and start_syst_1 are both counted by the model
+    nb_kicks = model.nb_kicks
+    return (task['model'], task['N'], task['beta'], task['gamma'], task['ca'], task['dist'],
+            task['deltaT'], task['seed'], activity / task['nb_steps'], time_to_death, nb_kicks,
+            potential / task['nb_steps'])
+
+
+def sweep(model, parameters, N=200, nb_steps=500, nb_replicas=1, seed=0, max_workers=None):
+    """Simulate the model (name in MODELS) for each dict of parameters (see grid and random_sample),
+    nb_replicas times each, in parallel over max_workers processes (all the cores by default).
+    Each run gets its own seed derived from seed, so a sweep always gives the same results.
+    Return a numpy structured array with one row per run and the fields RESULT_FIELDS."""
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model}, expected one of {list(MODELS)}")
+    runs = [(params, replica) for params in parameters for replica in range(nb_replicas)]
+    seeds = np.random.SeedSequence(seed).generate_state(len(runs))
+    tasks = []
+    for (params, replica), task_seed in zip(runs, seeds):
+        unknown = set(params) - set(PARAMETERS)
+        if unknown:
+            raise ValueError(f"Unknown parameters {unknown}, expected some of {list(PARAMETERS)}")
+        task = {name: float(params.get(name, default)) for name, default in PARAMETERS.items()}
+        task.update(model=model, N=N, nb_steps=nb_steps, seed=int(task_seed))
+        tasks.append(task)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        rows = list(executor.map(run_one, tasks, chunksize=max(1, len(tasks) // 64)))
+    return np.array(rows, dtype=RESULT_FIELDS)
+
+
+def save_results(results, path):
+    """Write the table of results of a sweep into a csv file"""
+    names = results.dtype.names
+    with open(path, 'w') as f:
+        f.write(','.join(names) + '\n')
+        for row in results:
+            f.write(','.join(str(row[name]) for name in names) + '\n')
+
+
+if __name__ == '__main__':
+    results = sweep('weighted', grid(beta=[0.1, 0.3, 0.5], gamma=[0.9, 0.95]), N=100, nb_steps=200,
+                    nb_replicas=4)
+    for row in results:
+        print(row)
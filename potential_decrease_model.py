@@ -1,9 +1,10 @@
 from py_project.psychoactive_model import PsychoactiveModel
-from py_project.weighted_model import WeightedModel
+from py_project.simplified_model import LazyPotential
 import numpy as np
 import math
-import random
 import copy
+from py_project.lookup_tables import activation_tables
+from py_project.stimulus import UniformStimulus
 
 class PotentialDecreaseModel(PsychoactiveModel):
     """So far until now, we consider that from the moment a neuron's potential reach the threshold,
@@ -87,14 +88,106 @@ class PotentialDecreaseModel(PsychoactiveModel):
     tPA = 1.
     tPD = 0.9
     tH = 1.1
-
-    def __init__(self, N, beta, gamma, ca, deltaT):
-        super().__init__(N, beta, gamma, ca)
+    tables = None  # ActivationTables used instead of the exponentials in the step (see use_lookup_tables)
+    NB_PHASES = 5
+    # below this potential, func_act_0 is a constant factor for catch_up
+    IDLE_TAIL = 1e-8
+    # signals fed by start_syst and start_syst_1 (see stimulus.py)
+    stimulus = UniformStimulus(0., (PsychoactiveModel.threshold + PsychoactiveModel.Vmax) / 2, signs=(0, 1))
+    rest_stimulus = UniformStimulus(0., PsychoactiveModel.threshold, signs=(-1, 0, 1))
+
+    def __init__(self, N, beta, gamma, ca, deltaT, links_format='dense', links=None, seed=None):
+        super().__init__(N, beta, gamma, ca, links_format, links, seed)
         self.deltaT = deltaT #time step 
         self.phase = self.init_system_phase()
         self.lamb = self.init_system_lambda()
         self.time_rest = self.init_system_rest()
 
+    # phase, lamb and time_rest are left behind by the event-driven steps like syst_potential,
+    # they are brought up to date (catch_up) before being read or replaced
+    def __set_phase(self, phase):
+        if self._lazy:
+            self.catch_up()
+        self._phase = phase
+        self._stale = True
+
+    def __get_phase(self):
+        if self._lazy:
+            self.catch_up()
+        return self._phase
+
+    phase = property(__get_phase, __set_phase)
+
+    def __get_phase_counts(self):
+        if self._lazy:
+            self.catch_up()
+        if self._stale:
+            self.recount()
+        return self._phase_counts.copy()
+
+    # number of neurons in each phase, kept up to date by the steps like nb_active
+    phase_counts = property(__get_phase_counts)
+
+    @staticmethod
+    def count_phases(phase):
+        """array -> array(NB_PHASES,)
+        Return the number of neurons in each phase"""
+        return np.bincount(np.asarray(phase, dtype=np.intp), minlength=PotentialDecreaseModel.NB_PHASES)
+
+    def __set_lamb(self, lamb):
+        if self._lazy:
+            self.catch_up()
+        self._lamb = lamb
+
+    def __get_lamb(self):
+        if self._lazy:
+            self.catch_up()
+        return self._lamb
+
+    lamb = property(__get_lamb, __set_lamb)
+
+    def __set_time_rest(self, time_rest):
+        if self._lazy:
+            self.catch_up()
+        self._time_rest = time_rest
+
+    def __get_time_rest(self):
+        if self._lazy:
+            self.catch_up()
+        return self._time_rest
+
+    time_rest = property(__get_time_rest, __set_time_rest)
+
+    def recount(self):
+        super().recount()
+        self._phase_counts = self.count_phases(self._phase)
+
+    def checkpoint_arrays(self):
+        arrays = super().checkpoint_arrays()
+        arrays.update(deltaT=self.deltaT, phase=self.phase, lamb=self.lamb, time_rest=self.time_rest)
+        # the tables are built again from their error when the checkpoint is restored (nan: no tables)
+        arrays['lookup_max_error'] = np.nan if self.tables is None else self.tables.max_error
+        return arrays
+
+    def restore_checkpoint(self, arrays):
+        super().restore_checkpoint(arrays)
+        self.deltaT = float(arrays['deltaT'])
+        self.phase = np.array(arrays['phase'])
+        self.lamb = np.array(arrays['lamb'])
+        self.time_rest = np.array(arrays['time_rest'])
+        self.tables = None
+        max_error = float(arrays.get('lookup_max_error', np.nan))
+        if not np.isnan(max_error):
+            self.use_lookup_tables(max_error)
+
+    def resize(self, N, links):
+        kept = min(N, self.N)
+        phase, lamb, time_rest = self.phase[:kept], self.lamb[:kept], self.time_rest[:kept]
+        super().resize(N, links)
+        self.phase = np.concatenate((phase, self.init_system_phase()[kept:]))
+        self.lamb = np.concatenate((lamb, self.init_system_lambda()[kept:]))
+        self.time_rest = np.concatenate((time_rest, self.init_system_rest()[kept:]))
+
     def init_system_phase(self):
         """Create a vector of size N which keeps tracks of the phase of all the neurons in the system.
         There are 5 phases stated in the document of algorithm."""
@@ -193,20 +286,117 @@ class PotentialDecreaseModel(PsychoactiveModel):
         self.time_rest[i] = math.exp(self.gamma * (1 - self.lamb[i])) * \
                             (PotentialDecreaseModel.tPD + PotentialDecreaseModel.tH) + self.deltaT
 
+    def use_lookup_tables(self, max_error=1e-6):
+        """Compute func_act_0 and exp(gamma * (1 - lamb)) in the step from interpolated tables
+        (see lookup_tables.py) whose error is below max_error, instead of exponentials.
+        model.tables = None goes back to the exact functions."""
+        self.tables = None
+        self.tables = activation_tables(self, max_error)
+
+    def _lookup(self):
+        """Return the tables used (None if the functions are exact), built again when gamma or
+        deltaT have changed"""
+        tables = self.tables
+        if tables is not None and (tables.gamma != self.gamma or tables.deltaT != self.deltaT):
+            self.use_lookup_tables(tables.max_error)
+            tables = self.tables
+        return tables
+
+    def _exp_lamb(self, lamb):
+        """array -> array
+        exp(gamma * (1 - lamb)) used by the functions of the phases 3 and 4"""
+        tables = self._lookup()
+        if tables is not None:
+            return tables.exp_lamb(lamb)
+        return np.exp(self.gamma * (1 - lamb))
+
+    def func_act_0_vect(self, potentiel):
+        """array -> array
+        Same as func_act_0 but applied at once to the potentials of all the neurons in phase 0"""
+        tables = self._lookup()
+        if tables is not None:
+            return tables.func_act_0(potentiel)
+        V_new = np.zeros_like(potentiel)
+        pos = (potentiel > 0) & (potentiel < PotentialDecreaseModel.threshold)
+        neg = (potentiel < 0) & (potentiel > PotentialDecreaseModel.Vmin_ma)
+        V_new[pos] = potentiel[pos] * np.exp(-1. /
+                                             (PotentialDecreaseModel.tau_min +
+                                              PotentialDecreaseModel.tau_max * potentiel[pos] / PotentialDecreaseModel.threshold) *
+                                             math.log(100 * PotentialDecreaseModel.threshold))
+        V_new[neg] = potentiel[neg] * np.exp(-1. /
+                                             (PotentialDecreaseModel.tau_min +
+                                              PotentialDecreaseModel.tau_max * potentiel[neg] / PotentialDecreaseModel.threshold) *
+                                             math.log(100 * abs(PotentialDecreaseModel.Vmin_ma)))
+        V_new[potentiel >= PotentialDecreaseModel.threshold] = PotentialDecreaseModel.threshold
+        V_new[potentiel <= PotentialDecreaseModel.Vmin_ma] = PotentialDecreaseModel.Vmin_ma
+        return V_new
+
+    def func_act_1_vect(self, potentiel, lamb):
+        """array * array -> array
+        Same as func_act_1 for all the neurons in phase 1, lamb being their coefficients lambda"""
+        V_new = potentiel + (2 * lamb *
+                             (PotentialDecreaseModel.Vmax - PotentialDecreaseModel.threshold) *
+                             self.deltaT / (PotentialDecreaseModel.tPA - self.deltaT))
+        var = lamb * (PotentialDecreaseModel.Vmax - PotentialDecreaseModel.threshold) + PotentialDecreaseModel.threshold
+        return np.where(V_new >= var, var, V_new)
+
+    def func_act_2_vect(self, potentiel, lamb):
+        """array * array -> array
+        Same as func_act_2 for all the neurons in phase 2, lamb being their coefficients lambda"""
+        V_new = potentiel - (2 * lamb *
+                             (PotentialDecreaseModel.Vmax - PotentialDecreaseModel.threshold) *
+                             self.deltaT / (PotentialDecreaseModel.tPA - self.deltaT))
+        return np.where(V_new <= PotentialDecreaseModel.threshold, PotentialDecreaseModel.threshold, V_new)
+
+    def func_act_3_vect(self, potentiel, lamb):
+        """array * array -> array
+        Same as func_act_3 for all the neurons in phase 3, lamb being their coefficients lambda"""
+        V_new = potentiel - self.deltaT * \
+                (PotentialDecreaseModel.threshold - lamb * PotentialDecreaseModel.Vrest) / \
+                (self._exp_lamb(lamb) * PotentialDecreaseModel.tPD)
+        return np.where(V_new < lamb * PotentialDecreaseModel.Vrest, lamb * PotentialDecreaseModel.Vrest, V_new)
+
+    def func_act_4_vect(self, potentiel, lamb):
+        """array * array -> array
+        Same as func_act_4 for all the neurons in phase 4, lamb being their coefficients lambda"""
+        V_new = potentiel - \
+                (lamb * PotentialDecreaseModel.Vrest * self.deltaT /
+                 (self._exp_lamb(lamb) * PotentialDecreaseModel.tH))
+        return np.where(V_new > 0, 0., V_new)
+
+    def update_lamb_vect(self, lamb, time_rest):
+        """array * array -> array
+        Same as update_lamb for the neurons of coefficients lamb and counters time_rest,
+        return their new coefficients lambda"""
+        return 1 - (time_rest /
+                    (self._exp_lamb(lamb) *
+                     (PotentialDecreaseModel.tPD + PotentialDecreaseModel.tH) + self.deltaT))
+
+    def give_time_ar_vect(self, lamb):
+        """array -> array
+        Same as give_time_ar for the neurons of coefficients lamb, return their new time_rest"""
+        return self._exp_lamb(lamb) * \
+            (PotentialDecreaseModel.tPD + PotentialDecreaseModel.tH) + self.deltaT
+
     def start_syst(self):
         """Send in the information in form electric ranged between 0 and (PotentialDecreaseModel.threshold + Vmax)/2
         (mV) to kick off the system. we suppose that this function will only be called when there are no transmission
         in between the neurons and all the neurons are at phase 0 (we still wait until the neurones at phase 3 and 4
         rest at 0 and turns to phase 0, meanwhile, others neurons at phase 0 will still decrease as defined)
+        The signals are drawn all at once by self.stimulus.
         Return None as the parametres given to the function is already modified """
-        print("System non transmittable. Feed signals")
-        for i in range(self.N):
-            self.syst_potential[i] = self.func_act_0(self.syst_potential[i] + 
-                                                   random.uniform(0, (PotentialDecreaseModel.threshold + PotentialDecreaseModel.Vmax)/2) * 
-                                                   random.choice([0,1]))
-            if self.syst_potential[i] == PotentialDecreaseModel.threshold:
-                self.syst_state[i] = 1
-                self.phase[i] = 1
+        start = self.profiler.clock() if self.profiler is not None else 0.
+        if self.verbose:
+            print("System non transmittable. Feed signals")
+        potential = self.func_act_0_vect(self.syst_potential + self.stimulus(self.rng, self.N))
+        fired = potential == PotentialDecreaseModel.threshold
+        state, phase = self.syst_state.copy(), self.phase.copy()
+        state[fired] = 1
+        phase[fired] = 1
+        self.syst_potential, self.syst_state, self.phase = potential, state, phase
+        self.nb_kicks += 1
+        if self.profiler is not None:
+            self.profiler.kick('start_syst', start)
 
     def start_syst_1(self):
         """Send in the information in form electric ranged between 0 and PotentialDecreaseModel.threshold (mV) to
@@ -214,47 +404,235 @@ class PotentialDecreaseModel(PsychoactiveModel):
         between the neurons which means all neurons are at phase {0,3,4}. Indeed, if a neuron in phase 3 or 4 is
         activated after this functions is called, the new Vmax will be calculated, else, we have to set its lambda
         back to 1
+        The signals are drawn all at once by self.rest_stimulus.
         Return None as the parametres given to the function is already modified """
-        print("System at rest. Feed signals")
-        for i in range(self.N):
-            self.syst_potential[i] = self.func_act_0(self.syst_potential[i] + 
-                                                   random.uniform(0, PotentialDecreaseModel.threshold) * 
-                                                   random.choice([-1,0,1]))
-            if self.syst_potential[i] == PotentialDecreaseModel.threshold:
-                if self.phase[i] == 3 or self.phase[i] == 4:
-                    self.update_lamb(i)
-                self.syst_state[i] = 1
-                self.phase[i] = 1
-            else:
-                self.lamb[i] = 1
-                self.phase[i] = 0
+        start = self.profiler.clock() if self.profiler is not None else 0.
+        if self.verbose:
+            print("System at rest. Feed signals")
+        potential = self.func_act_0_vect(self.syst_potential + self.rest_stimulus(self.rng, self.N))
+        fired = potential == PotentialDecreaseModel.threshold
+        state, phase, lamb = self.syst_state.copy(), self.phase.copy(), self.lamb.copy()
+        # the neurons activated during their cycle get a new Vmax
+        in_cycle = fired & ((phase == 3) | (phase == 4))
+        lamb[in_cycle] = self.update_lamb_vect(lamb[in_cycle], self.time_rest[in_cycle])
+        state[fired] = 1
+        phase[fired] = 1
+        lamb[~fired] = 1
+        phase[~fired] = 0
+        self.syst_potential, self.syst_state, self.phase, self.lamb = potential, state, phase, lamb
+        self.nb_kicks += 1
+        if self.profiler is not None:
+            self.profiler.kick('start_syst_1', start)
 
     def non_transmittable(self):
         """Verify if there is no transmission between neurons and all neurons are at phase 0
         This function is compatible with the function start_syst
         return a bool"""
-        res = True
-        for i in range(self.N):
-            if self.syst_state[i] == 1 or self.phase[i] != 0:
-                res = False
-                break
-        return res
+        if self.nb_active:
+            return False
+        # the phases of the neurons left aside by the event-driven steps are those of their last
+        # update, only the neurons which were not in phase 0 then are brought up to date
+        if self._lazy and self._phase_counts[0] != len(self._phase):
+            self.catch_up(np.flatnonzero(self._phase))
+        return self._phase_counts[0] == len(self._phase)
 
     def all_neurones_rest(self):
         """Verify if all the neurons' potentiels are 0
         return a bool"""
-        res = True
-        for i in range(self.N):
-            if self.syst_potential[i] != 0:
-                res = False
-                break
-        return res
+        # the active neurons are above the threshold, the potentials are only looked at when
+        # there is none
+        if self.nb_active:
+            return False
+        # only the neurons left aside which were not at rest are brought up to date
+        if self._lazy:
+            self.catch_up(np.flatnonzero((self._syst_potential != 0) | (self._phase != 0)))
+        return not self._syst_potential.any()
 
     def update_system_one_step(self):
+        """Calculate the potentials of all the neurons at the time t+1 and also update theirs state at time t+1 (activated or not)
+        All neurons will be update simultaneously.
+
+        Instead of going through the neurons one by one, the neurons are grouped by their phase with boolean masks
+        and the activate function of each phase is applied at once to its group. lamb, time_rest and phase are
+        updated the same way. Gives the same results as update_system_one_step_loop."""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_step()
+        # neurons not in the potential of action receive from the active ones (phase = {0,3,4}),
+        # nothing to compute when there is none
+        received = 0.
+        if self.nb_active:
+            sent = (self.syst_potential - PotentialDecreaseModel.threshold) * self.syst_state
+            received = self.syst_links.matvec(sent)
+        if profiler is not None:
+            profiler.lap('receive')
+        self._step_neurons(slice(None), received, profiler)
+        if profiler is not None:
+            profiler.end_step(self.syst_state, self.phase)
+
+    def _step_neurons(self, index, received, profiler=None):
+        """Compute the step t+1 of the neurons index (slice or array of indices) given the sums received
+        from the active neurons. Their potential, state, phase, lamb and time_rest are updated in place,
+        the other neurons are not modified. The counters of the model are updated from the transitions
+        of the step."""
+        threshold = PotentialDecreaseModel.threshold
+        potential = self._syst_potential[index]
+        state = self.syst_state[index]
+        phase = self._phase[index]
+        lamb = self._lamb[index]
+        time_rest = self._time_rest[index]
+        new_potential = np.zeros_like(potential)
+
+        # the neurons in the potential of action (phase = {1,2}) keep their potential before being
+        # affected by func_act
+        receiving = state == 0
+        var = np.where(receiving, self.beta * (received + self.syst_links.diag[index] * potential), potential)
+        # manipulate the time_rest of the receiving neurons, lambda is back to 1 when the time is up
+        counting = receiving & (time_rest > 0)
+        over = receiving & ~(time_rest > 0)
+        time_rest[counting] -= self.deltaT
+        lamb[over] = 1
+        time_rest[over] = 0
+
+        # neurons of phase 3 and 4 receiving potential from others break off and return into phase 0
+        in_3, in_4 = phase == 3, phase == 4
+        broken = (in_3 | in_4) & (var != potential)
+        phase_0 = (phase == 0) | broken
+        phase_1 = phase == 1
+        phase_2 = phase == 2
+        phase_3 = in_3 & ~broken
+        phase_4 = in_4 & ~broken
+
+        new_potential[phase_0] = self.func_act_0_vect(var[phase_0])
+        new_potential[phase_1] = self.func_act_1_vect(var[phase_1], lamb[phase_1])
+        new_potential[phase_2] = self.func_act_2_vect(var[phase_2], lamb[phase_2])
+        new_potential[phase_3] = self.func_act_3_vect(var[phase_3], lamb[phase_3])
+        new_potential[phase_4] = self.func_act_4_vect(var[phase_4], lamb[phase_4])
+        if profiler is not None:
+            profiler.lap('activation')
+
+        Vmax_current = lamb * (PotentialDecreaseModel.Vmax - threshold) + threshold
+        depolarised = phase_0 & (new_potential == threshold)
+        at_peak = phase_1 & (new_potential == Vmax_current)
+        repolarised = phase_2 & (new_potential == threshold)
+        at_rest = phase_3 & (new_potential == lamb * PotentialDecreaseModel.Vrest)
+        recovered = phase_4 & (new_potential == 0)
+
+        phase[broken] = 0
+        state[depolarised] = 1
+        phase[depolarised] = 1
+        lamb[depolarised] = self.update_lamb_vect(lamb[depolarised], time_rest[depolarised])
+        phase[at_peak] = 2
+        state[repolarised] = 0
+        phase[repolarised] = 3
+        time_rest[repolarised] = self.give_time_ar_vect(lamb[repolarised])
+        phase[at_rest] = 4
+        phase[recovered] = 0
+        lamb[recovered] = 1
+
+        # moves between the phases: 3 / 4 -> 0 (broken), 0 -> 1 -> 2 -> 3 -> 4 -> 0
+        nb = np.count_nonzero
+        from_3, from_4 = nb(broken & in_3), nb(broken & in_4)
+        to_1, to_2, to_3, to_4, to_0 = nb(depolarised), nb(at_peak), nb(repolarised), nb(at_rest), nb(recovered)
+        self._nb_active += to_1 - to_3
+        self._phase_counts += (from_3 + from_4 + to_0 - to_1, to_1 - to_2, to_2 - to_3,
+                               to_3 - to_4 - from_3, to_4 - to_0 - from_4)
+        self._syst_potential[index] = new_potential
+        self.syst_state[index] = state
+        self._phase[index] = phase
+        self._lamb[index] = lamb
+        self._time_rest[index] = time_rest
+        if profiler is not None:
+            profiler.lap('transition')
+
+    def catch_up(self, index=None):
+        """Bring up to date the neurons index (all of them by default) left aside by the event-driven
+        steps. Such a neuron was idle: it received nothing and was not active. Without the steps
+        being replayed one by one:
+        - a neuron in phase 3 or 4 breaks into phase 0 (or ends its cycle) within 3 idle steps,
+          only these few steps are computed;
+        - in phase 0, time_rest counts down by deltaT until it reaches 0, then lamb is back to 1,
+          which is computed directly for the number of steps skipped;
+        - the potential follows func_act_0, which is computed step by step only while it is above
+          IDLE_TAIL (about 25 steps from the threshold). Below, func_act_0(x) is x * exp(-log(100 *
+          threshold) / tau_min) up to a relative error below 1e-9, so the remaining steps are a
+          power of this factor.
+        The cost doesn't depend on the time the neuron was left aside anymore, the potentials are
+        the same as the full steps up to rounding errors."""
+        if self._last_update is None:
+            return
+        if index is None:
+            index = np.arange(self.N)
+            self._lazy = False
+        late = self._clock - self._last_update[index]
+        pending, late = index[late > 0], late[late > 0]
+        self._last_update[index] = self._clock
+        # end of the cycles
+        cycling = self._phase[pending] != 0
+        while cycling.any():
+            self._step_neurons(pending[cycling], 0.)
+            late[cycling] -= 1
+            pending, late = pending[late > 0], late[late > 0]
+            cycling = self._phase[pending] != 0
+        if not len(pending):
+            return
+
+        time_rest = self._time_rest[pending]
+        counting = np.ceil(np.maximum(time_rest, 0) / self.deltaT)
+        over = late > counting
+        self._time_rest[pending] = np.where(over, 0., time_rest - late * self.deltaT)
+        self._lamb[pending[over]] = 1
+
+        potential = self._syst_potential[pending]
+        diag = self.syst_links.diag[pending]
+        moving = (np.abs(potential) >= PotentialDecreaseModel.IDLE_TAIL) & (late > 0)
+        while moving.any():
+            potential[moving] = self.func_act_0_vect(self.beta * (diag[moving] * potential[moving]))
+            late[moving] -= 1
+            moving &= (np.abs(potential) >= PotentialDecreaseModel.IDLE_TAIL) & (late > 0)
+        tau = np.where(potential > 0, math.log(100 * PotentialDecreaseModel.threshold),
+                       math.log(100 * abs(PotentialDecreaseModel.Vmin_ma))) / PotentialDecreaseModel.tau_min
+        potential *= (self.beta * diag * np.exp(-tau)) ** late
+        self._syst_potential[pending] = potential
+
+    def update_system_one_step_event(self):
+        """Same step as update_system_one_step where only the active neurons and the neurons they send
+        signal to are computed (see SimplifiedModel.update_system_one_step_event). The idle neurons are
+        brought up to date by catch_up when they receive a signal again or when they are read. If the
+        leak beta * syst_links[i][i] of a neuron is not below 1, an idle neuron could depolarise by
+        itself, then the whole step is computed."""
+        if np.any(self.leak_factor() >= 1):
+            self.update_system_one_step()
+            return
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_step()
+        if self._last_update is None:
+            self._last_update = np.zeros(self.N, dtype=np.int64)
+            self._clock = 0
+        if self._stale:
+            self.recount()
+        active = np.flatnonzero(self.syst_state)
+        rows, senders, weights = self.syst_links.gather_columns(active)
+        touched, inverse = np.unique(np.concatenate((rows, active)), return_inverse=True)
+        self.catch_up(touched)
+        sent = self._syst_potential[senders] - PotentialDecreaseModel.threshold
+        received = np.bincount(inverse[:len(rows)], weights=weights * sent, minlength=len(touched))
+        if profiler is not None:
+            profiler.lap('receive')
+        self._step_neurons(touched, received, profiler)
+        self._clock += 1
+        self._last_update[touched] = self._clock
+        self._lazy = True
+        if profiler is not None:
+            profiler.end_step(self.syst_state, self._phase)
+
+    def update_system_one_step_loop(self):
         """matrix(N,N) ^2 * matrix(N,1) ^5 -> tuple(matrix(N,N), matrix(N,1))
         Calculate the potentials of all the neurons at the time t+1 and also update theirs state at time t+1 (activated or not)
         All neurons will be update simultaneously.
-        Return the potentials and their states of the whole system in form matrix."""
+        Return the potentials and their states of the whole system in form matrix.
+        Reference implementation, neuron by neuron, of update_system_one_step."""
         new_syst_potentiel = self.init_syst_potential()
         new_syst_state = copy.deepcopy(self.syst_state)
         var = 0  # variable temporary
@@ -347,17 +725,19 @@ class PotentialDecreaseModel(PsychoactiveModel):
 
         self.syst_potential = new_syst_potentiel
         self.syst_state = new_syst_state
+        self.recount()
 
-    def simulation(self, nb_steps):
+    def simulation(self, nb_steps, event_driven=False):
         """Return a list of all the matrixes, each matrix shows the potentials of the system
-        at moment t"""
+        at moment t. With event_driven=True, the steps are computed by
+        update_system_one_step_event."""
+        update = self.update_system_one_step_event if event_driven else self.update_system_one_step
         for i in range(nb_steps):
             if self.all_neurones_rest():
                 self.start_syst_1()
             if self.non_transmittable():
                 self.start_syst()
             else:
-                self.update_system_one_step()
-            yield (self.syst_state.copy(), self.syst_potential.copy())
-
+                update()
+            yield (self.syst_state.copy(), LazyPotential(self) if event_driven else self.syst_potential.copy())
 
@@ -29,8 +29,8 @@ class PsychoactiveModel(WeightedModel):
     """
 
 
-    def __init__(self, N, beta, gamma, ca):
-        super().__init__(N, beta, gamma)
+    def __init__(self, N, beta, gamma, ca, links_format='dense', links=None, seed=None):
+        super().__init__(N, beta, gamma, links_format, links, seed)
         self.ca = ca
         self.init_system_links_ca()
 
@@ -45,17 +45,64 @@ class PsychoactiveModel(WeightedModel):
 
     ca = property(__get_ca, __set_ca)
 
+    def checkpoint_arrays(self):
+        arrays = super().checkpoint_arrays()
+        arrays['ca'] = self.ca
+        arrays['ca_affected'] = self.affected
+        arrays['ca_weights'] = self._ca_weights
+        return arrays
+
+    def restore_checkpoint(self, arrays):
+        super().restore_checkpoint(arrays)
+        self.ca = float(arrays['ca'])
+        self.affected = np.array(arrays['ca_affected'])
+        self._ca_links = self.syst_links
+        self._ca_positions = self.syst_links.row_positions(self.affected)
+        self._ca_weights = np.array(arrays['ca_weights'])
+
+    def set_links(self, links):
+        # the links kept get their weight without the effect back (see WeightedModel.set_links),
+        # then the effect is applied again to the same neurons
+        if self._ca_links is self.syst_links:
+            self.syst_links.data[self._ca_positions] = self._ca_weights
+        affected = self.affected
+        super().set_links(links)
+        self._ca_links = None
+        self._scale_affected(affected[affected < self.N])
+
     def init_system_links_ca(self):
-        nb_affected = round(self.N * self.ca)
-        affected = []
-        while len(affected) < nb_affected:
-            k = np.random.randint(0, self.N)
-            if k not in affected:
-                affected.append(k)
-        for i in affected:
-            for j in range(self.N):
-                if i != j:
-                    self.syst_links[i][j] *= 1+self.ca
+        """Apply the effect of ca to the links just created: round(N * |ca|) neurons are drawn
+        without replacement in one call and the links they receive are multiplied by (1 + ca),
+        all their rows at once directly in the store of syst_links.
+        The weights of these rows before the effect are kept, so that another ca can be applied
+        later by update_ca without compounding the effects."""
+        self._ca_links = None
+        self._scale_affected()
+
+    def update_ca(self, ca):
+        """Change the concentration of the substance to ca: the rows affected by the previous
+        ca get their weights back and the new effect is applied, in O(affected rows) instead
+        of creating the links again"""
+        if self._ca_links is self.syst_links:
+            self.syst_links.data[self._ca_positions] = self._ca_weights
+        self.ca = ca
+        self._scale_affected()
+
+    def _scale_affected(self, kept=None):
+        """Apply the effect of ca to round(N * |ca|) neurons drawn at random, or to the neurons
+        kept completed by neurons drawn among the others"""
+        links = self.syst_links
+        nb_affected = round(self.N * abs(self.ca))
+        if kept is None:
+            self.affected = self.rng.choice(self.N, nb_affected, replace=False)
+        else:
+            kept = kept[:nb_affected]
+            others = np.setdiff1d(np.arange(self.N), kept)
+            self.affected = np.concatenate((kept, self.rng.choice(others, nb_affected - len(kept), replace=False)))
+        self._ca_links = links
+        self._ca_positions = links.row_positions(self.affected)
+        self._ca_weights = links.data[self._ca_positions]
+        links.data[self._ca_positions] = self._ca_weights * (1 + self.ca)
 
 
 
@@ -1,10 +1,35 @@
 import numpy as np
-import copy
-import random
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import math
+import json
 from copy import deepcopy
+from py_project.connectivity import as_links, links_from_arrays
+from py_project.stimulus import UniformStimulus, make_rng
+
+
+class LazyPotential:
+    """Potentials yielded by simulation(event_driven=True), read without bringing all the neurons
+    up to date: potential[index] only catches up the neurons index, np.asarray(potential) (or
+    np.mean...) all of them. They are only valid until the next step of the model."""
+
+    def __init__(self, model):
+        self.model = model
+        self._step = model._clock
+        self._array = model._syst_potential
+
+    def _check(self):
+        if self.model._clock != self._step or self.model._syst_potential is not self._array:
+            raise RuntimeError("The model was stepped since these potentials were given")
+
+    def __len__(self):
+        return self.model.N
+
+    def __getitem__(self, index):
+        self._check()
+        self.model.catch_up(np.atleast_1d(np.arange(self.model.N)[index]))
+        return self.model._syst_potential[index].copy()
+
+    def __array__(self, dtype=None, copy=None):
+        self._check()
+        return np.array(self.model.syst_potential, dtype=dtype)
 
 
 class SimplifiedModel:
@@ -62,15 +87,81 @@ class SimplifiedModel:
 
     threshold = 50.  # the threshold of activation of neuron, in mV, used in functions
     Vmax = 120.  # the potential of neuron when pass the seuil
-
-    def __init__(self, N, beta, gamma):
+    profiler = None  # StepProfiler (see instrumentation.py) recording the steps when attached
+    nb_kicks = 0  # number of kick-offs (start_syst, start_syst_1) since the model was created
+    verbose = True  # print a message at each kick-off
+    stimulus = UniformStimulus(0., Vmax)  # signals fed by start_syst (see stimulus.py)
+    # event-driven steps: step of the last update of each neuron, number of steps, potentials left behind
+    _last_update = None
+    _clock = 0
+    _lazy = False
+    # counter of the active neurons, updated by the steps from the neurons they change; it is only
+    # counted again (recount) after syst_state or syst_potential are replaced (_stale)
+    _nb_active = 0
+    _stale = True
+
+    def __init__(self, N, beta, gamma, links_format='dense', links=None, seed=None):
         self.N = N
         self.beta = beta
         self.gamma = gamma
-        self.syst_links = self.init_system_links()
+        self.links_format = links_format
+        # generator of all the random draws of the model (links, weights, kick-offs...), the same
+        # seed gives the same network and the same kick-offs; without seed, it is seeded from the
+        # global np.random (see make_rng)
+        self.rng = make_rng(seed)
+        # links can be given to reuse a structure of connections already built (a copy is made),
+        # otherwise they are drawn randomly
+        self.syst_links = self.init_system_links() if links is None else as_links(links, links_format).copy()
         self.syst_state = self.init_syst_state()
         self.syst_potential = self.init_syst_potential()
 
+    def __set_syst_links(self, links):
+        # whatever is given (list of lists, matrix or store), syst_links is kept in
+        # the store of the format chosen for the model (see connectivity.py)
+        # the leak skipped by the event-driven steps is applied with the diagonal it was skipped with
+        if self._lazy:
+            self.catch_up()
+        self._syst_links = as_links(links, self.links_format)
+
+    def __get_syst_links(self):
+        return self._syst_links
+
+    syst_links = property(__get_syst_links, __set_syst_links)
+
+    def __set_syst_potential(self, potential):
+        # a new vector of potentials is up to date, the event-driven steps start again from it
+        if self._lazy:
+            self.catch_up()
+        self._syst_potential = potential
+        self._stale = True
+        self._last_update = None
+        self._lazy = False
+
+    def __get_syst_potential(self):
+        # after event-driven steps, the leak of the neurons left aside is applied before reading
+        if self._lazy:
+            self.catch_up()
+        return self._syst_potential
+
+    syst_potential = property(__get_syst_potential, __set_syst_potential)
+
+    def __set_syst_state(self, state):
+        self._syst_state = state
+        self._stale = True
+
+    def __get_syst_state(self):
+        return self._syst_state
+
+    syst_state = property(__get_syst_state, __set_syst_state)
+
+    def __get_nb_active(self):
+        if self._stale:
+            self.recount()
+        return self._nb_active
+
+    # number of active neurons, without going through syst_state
+    nb_active = property(__get_nb_active)
+
     def __set_N(self, N):
         if not isinstance(N, int):
             raise AttributeError
@@ -84,6 +175,8 @@ class SimplifiedModel:
     def __set_beta(self, beta):
         if not isinstance(beta, float):
             raise AttributeError
+        if self._lazy:
+            self.catch_up()
         self._beta = beta if 0.0 <= beta <= 1.0 else 0.5
 
     def __get_beta(self):
@@ -108,6 +201,75 @@ class SimplifiedModel:
                 The network connection is represented by: \n \
                 {np.array(self.syst_links)}"
 
+    def checkpoint_arrays(self):
+        """Return a dict of the arrays describing the whole state of the model: its parameters,
+        links, potentials, states and the state of its random generator. Subclasses add their
+        own arrays to it."""
+        arrays = {'model': type(self).__name__, 'N': self.N, 'beta': self.beta, 'gamma': self.gamma,
+                  'links_format': self.links_format,
+                  'syst_state': self.syst_state, 'syst_potential': self.syst_potential}
+        for key, value in self.syst_links.to_arrays().items():
+            arrays['syst_links_' + key] = value
+        arrays['rng_state'] = json.dumps(self.rng.bit_generator.state)
+        return arrays
+
+    def restore_checkpoint(self, arrays):
+        """Set the state of the model from the arrays given by checkpoint_arrays"""
+        self.N = int(arrays['N'])
+        self.beta = float(arrays['beta'])
+        self.gamma = float(arrays['gamma'])
+        self.links_format = str(arrays['links_format'])
+        self.syst_links = links_from_arrays({key[len('syst_links_'):]: arrays[key]
+                                             for key in arrays if key.startswith('syst_links_')})
+        self.syst_state = np.array(arrays['syst_state'])
+        self.syst_potential = np.array(arrays['syst_potential'])
+        state = json.loads(str(arrays['rng_state']))
+        self.rng = np.random.Generator(getattr(np.random, state['bit_generator'])())
+        self.rng.bit_generator.state = state
+
+    def save_checkpoint(self, path):
+        """Save the whole state of the model in the file path (.npz), the simulation restored by
+        load_checkpoint continues exactly as if it had never been stopped"""
+        np.savez(path, **self.checkpoint_arrays())
+
+    @classmethod
+    def load_checkpoint(cls, path):
+        """Create a model from the checkpoint saved in the file path by save_checkpoint.
+        The generator of the model is set back to its state at the moment of the save, the
+        global generators (random, np.random) are not touched."""
+        if not str(path).endswith('.npz'):
+            path = str(path) + '.npz'
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+        if str(arrays['model']) != cls.__name__:
+            raise ValueError(f"The checkpoint {path} is a {arrays['model']}, not a {cls.__name__}")
+        model = cls.__new__(cls)
+        model.restore_checkpoint(arrays)
+        return model
+
+    def recount(self):
+        """Count again the active neurons. The steps update the counters themselves, they are
+        counted again when they are read after syst_state or syst_potential were replaced, and
+        this has to be called after these arrays were modified in place from outside."""
+        self._nb_active = int(np.count_nonzero(self._syst_state))
+        self._stale = False
+
+    def set_links(self, links):
+        """Replace the connections of the network by links, given like to the constructor (a
+        structure of connections like NeighborhoodGraph.links), the potentials and states are kept"""
+        self.syst_links = links
+
+    def resize(self, N, links):
+        """Change the number of neurons of the network to N: the neurons kept (the first ones)
+        keep their potential and state, the neurons added start at rest. links are the
+        connections of the resized network, given like to set_links."""
+        kept = min(N, self.N)
+        state, potential = self.syst_state[:kept], self.syst_potential[:kept]
+        self.N = N
+        self.syst_state = np.concatenate((state, self.init_syst_state()[kept:]))
+        self.syst_potential = np.concatenate((potential, self.init_syst_potential()[kept:]))
+        self.set_links(links)
+
     def init_system_links(self):
         """Create a matrix of 2 dimensions (NxN) which shows the connections between
          neurons in the system. Initiated randomly and stay the same throughout the
@@ -116,8 +278,9 @@ class SimplifiedModel:
         syst_links[i][j] = 0: j doesnt connect to i
         syst_links[i][i] = gamma/beta where gamma is the factor of leaking potential
         of the neuron i."""
-        return [[random.choice([0.0, 1.0]) if j != i else self.gamma / self.beta
-                 for j in range(self.N)] for i in range(self.N)]
+        links = (self.rng.random((self.N, self.N)) < 0.5).astype(float)
+        np.fill_diagonal(links, self.gamma / self.beta)
+        return links
 
     def init_syst_potential(self):
         """Create a matrix of 1D that represents the potential of each neuron at
@@ -125,7 +288,7 @@ class SimplifiedModel:
 
         syst_potentiel[i] = value of potential of neuron i
         The matrix will be initiated with all zeros."""
-        return [0.0 for j in range(self.N)]
+        return np.zeros(self.N, dtype=float)
 
     def init_syst_state(self):
         """Create a matrix of size (N,) which shows the state of activation of a neuron
@@ -135,7 +298,7 @@ class SimplifiedModel:
         syst_act[i][0] = 1: neuron i is activated and can send signal to others
         When the potential of a neuron i passes the threshold, syst_state[i][0] = 1 at the next step
         After release all its potential, syst_state[i][0] = 0 at the next step"""
-        return [0 for i in range(self.N)]
+        return np.zeros(self.N, dtype=int)
 
     def matrix_Ni(self, i: int):
         """Create a matrix which helps keeping the potential of
@@ -151,20 +314,133 @@ class SimplifiedModel:
         When a neuron is activated, its potential increase immediately to Vmax"""
         return val_poten if val_poten < SimplifiedModel.threshold else SimplifiedModel.Vmax
 
+    def func_act_vect(self, val_poten):
+        """array(N,) => array(N,)
+        Same as func_act but applied to the potentials of all the neurons at once."""
+        return np.where(val_poten < SimplifiedModel.threshold, val_poten, SimplifiedModel.Vmax)
+
     def start_syst(self):
         """Send in the information in form electric ranged between 0 and Vmax (mV)
-         to kick off the system."""
-        print("Feed potentials to the system.")
-        for i in range(self.N):
-            self.syst_potential[i] = self.func_act(
-                self.syst_potential[i] + random.uniform(0.0, SimplifiedModel.Vmax))
-            self.syst_state[i] = 1 if self.syst_potential[i] >= SimplifiedModel.threshold else 0
+         to kick off the system. The potentials are drawn all at once by self.stimulus."""
+        start = self.profiler.clock() if self.profiler is not None else 0.
+        if self.verbose:
+            print("Feed potentials to the system.")
+        self.syst_potential = self.func_act_vect(self.syst_potential + self.stimulus(self.rng, self.N))
+        self.syst_state = (self.syst_potential >= SimplifiedModel.threshold).astype(int)
+        self.nb_kicks += 1
+        if self.profiler is not None:
+            self.profiler.kick('start_syst', start)
+
+    def receive(self):
+        """Return the vector of size (N,) of the potentials that each neuron holds at the
+        moment t+1 before being affected by the activate function:
+        sum(syst_links[i][j] * d(j, t) * V(j, t)) for j != i plus the leftover
+        syst_links[i][i] * (1 - d(i, t)) * V(i, t) of the neuron itself.
+        The whole system is computed with one matrix-vector product, in O(nnz) when
+        the links are stored in a sparse format."""
+        sent = self.syst_potential * self.syst_state
+        kept = self.syst_potential * (1 - self.syst_state)
+        return self.syst_links.matvec(sent) + self.syst_links.diag * kept
 
     def update_system_one_step(self):
         """Calculate the potentials of all the neurons at the time t+1 and also update
         theirs state at time t+1 (activated or not).
         All neurons will be update simultaneously.
-        Update the potentials and their states of the whole system in form matrix."""
+        Update the potentials and their states of the whole system in form matrix:
+        V(t+1) = f(beta * (W.(d(t) * V(t)) + diag(W) * (1 - d(t)) * V(t)))"""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_step()
+        received = self.receive()
+        if profiler is not None:
+            profiler.lap('receive')
+        new_potential = self.func_act_vect(self.beta * received)
+        if profiler is not None:
+            profiler.lap('activation')
+        # receive() brought all the neurons up to date, the counter comes from the new states
+        new_state = (new_potential >= SimplifiedModel.threshold).astype(int)
+        self._syst_state, self._syst_potential = new_state, new_potential
+        self._nb_active = int(np.count_nonzero(new_state))
+        self._last_update = None
+        if profiler is not None:
+            profiler.lap('transition')
+            profiler.end_step(self.syst_state)
+
+    def leak_factor(self):
+        """Return the vector of size (N,) of the factors beta * syst_links[i][i] (gamma) by which
+        the potential of an inactive neuron receiving nothing is multiplied at each step"""
+        return self.beta * self.syst_links.diag
+
+    def catch_up(self, index=None):
+        """Apply to the neurons index (all of them by default) the leak they skipped during the
+        event-driven steps: a neuron left aside for k steps was inactive and received nothing, so
+        its potential is V * leak_factor ** k."""
+        if self._last_update is None:
+            return
+        if index is None:
+            index = slice(None)
+            self._lazy = False
+        late = self._clock - self._last_update[index]
+        self._syst_potential[index] *= self.leak_factor()[index] ** late
+        self._last_update[index] = self._clock
+
+    def update_system_one_step_event(self):
+        """Same step as update_system_one_step, but only the active neurons and the neurons they
+        send signal to are computed. The links sent by the active neurons are the columns of
+        syst_links (fast with links_format='csc'), their contributions are summed with bincount
+        on the receivers only. The other neurons are inactive and receive nothing, their
+        potential only leaks: it is applied later in one go by catch_up, when they receive a
+        signal again or when syst_potential is read.
+        The cost of a step depends on the activity of the network instead of N^2 (or nnz),
+        which is faster on large networks where few neurons fire at once. The potentials are
+        the same as update_system_one_step up to rounding errors.
+        If the leak beta * syst_links[i][i] of a neuron is not below 1, an idle neuron could reach
+        the threshold by itself, then the whole step is computed."""
+        if np.any(self.leak_factor() >= 1):
+            self.update_system_one_step()
+            return
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_step()
+        if self._last_update is None:
+            self._last_update = np.zeros(self.N, dtype=np.int64)
+            self._clock = 0
+        if self._stale:
+            self.recount()
+        potential = self._syst_potential
+        active = np.flatnonzero(self.syst_state)
+        rows, senders, weights = self.syst_links.gather_columns(active)
+        touched, inverse = np.unique(np.concatenate((rows, active)), return_inverse=True)
+        # (without any link sent, bincount gives integers)
+        received = np.bincount(inverse[:len(rows)], weights=weights * potential[senders],
+                               minlength=len(touched)).astype(float, copy=False)
+        self.catch_up(touched)
+        kept = potential[touched] * (1 - self.syst_state[touched])
+        received += self.syst_links.diag[touched] * kept
+        if profiler is not None:
+            profiler.lap('receive')
+        new_potential = self.func_act_vect(self.beta * received)
+        if profiler is not None:
+            profiler.lap('activation')
+        new_state = new_potential >= SimplifiedModel.threshold
+        # the neurons active before are all among the neurons computed
+        self._nb_active += np.count_nonzero(new_state) - len(active)
+        self.syst_state[touched] = new_state
+        potential[touched] = new_potential
+        self._clock += 1
+        self._last_update[touched] = self._clock
+        self._lazy = True
+        if profiler is not None:
+            profiler.lap('transition')
+            profiler.end_step(self.syst_state)
+
+    def update_system_one_step_loop(self):
+        """Calculate the potentials of all the neurons at the time t+1 and also update
+        theirs state at time t+1 (activated or not).
+        All neurons will be update simultaneously.
+        Update the potentials and their states of the whole system neuron by neuron.
+        Reference implementation of update_system_one_step, much slower but kept to
+        check the results of the matrix form."""
         new_potential = deepcopy(self.syst_potential)
         new_state = deepcopy(self.syst_state)
         for i in range(self.N):
@@ -187,17 +463,20 @@ class SimplifiedModel:
     def non_transmittable(self):
         """Verify if there is no neuron that can transmit signal to others
         Return a bool"""
-        return all([x == 0 for x in self.syst_state])
+        return self.nb_active == 0
 
-    def simulation(self, nb_steps: int):
+    def simulation(self, nb_steps: int, event_driven=False):
         """Return a list of all the matrixes, each matrix shows the potentials of the system
-        at moment t"""
+        at moment t. With event_driven=True, the steps are computed by
+        update_system_one_step_event and the potentials are given as a LazyPotential, so that
+        the neurons left aside are only brought up to date if they are read."""
+        update = self.update_system_one_step_event if event_driven else self.update_system_one_step
         for i in range(nb_steps):
             if self.non_transmittable():
                 self.start_syst()
             else:
-                self.update_system_one_step()
-            yield (self.syst_state.copy(), self.syst_potential.copy())
+                update()
+            yield (self.syst_state.copy(), LazyPotential(self) if event_driven else self.syst_potential.copy())
 
 
 if __name__ == '__main__':
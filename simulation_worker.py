@@ -0,0 +1,131 @@
+import threading
+import time
+
+import numpy as np
+
+
+class SnapshotBuffer:
+    """Last snapshot (step, syst_state, syst_potential...) published by a simulation running in
+    another thread, read by the interface whenever it draws a frame.
+
+    The writer never waits for the reader: the snapshots are written alternately in two slots
+    of preallocated arrays (double buffer) and the index of the last complete slot is switched
+    after the copy. Each slot has a sequence number, odd while the slot is being written, so a
+    reader that copied a slot overwritten in the meantime (the writer went twice around)
+    notices it and reads the newest slot again."""
+
+    def __init__(self):
+        self._slots = [{}, {}]
+        self._steps = [-1, -1]
+        self._sequences = [0, 0]
+        self._front = 0
+        self.published = False
+
+    def publish(self, step, **arrays):
+        """Copy the arrays given (syst_state=..., syst_potential=...) of the step as last snapshot"""
+        back = 1 - self._front
+        slot = self._slots[back]
+        self._sequences[back] += 1
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if name not in slot or slot[name].shape != array.shape or slot[name].dtype != array.dtype:
+                slot[name] = np.empty_like(array)
+            np.copyto(slot[name], array)
+        self._steps[back] = step
+        self._sequences[back] += 1
+        self._front = back
+        self.published = True
+
+    def latest(self):
+        """Return (step, dict of the arrays) of the last snapshot published, copies that the
+        writer does not touch, or None if nothing was published yet"""
+        if not self.published:
+            return None
+        while True:
+            front = self._front
+            sequence = self._sequences[front]
+            if sequence % 2 == 0:
+                step = self._steps[front]
+                arrays = {name: array.copy() for name, array in self._slots[front].items()}
+                if self._sequences[front] == sequence:
+                    return step, arrays
+            time.sleep(0)
+
+
+class SimulationWorker(threading.Thread):
+    """Run the steps of a model in a thread, apart from the interface which only samples the last
+    snapshot (worker.snapshots.latest()) at its own frame rate.
+
+    The worker advances as fast as possible (steps_per_second=None) or at steps_per_second.
+    If an ActivityHistory is given (history), the counters of the model (nb_active, and
+    phase_counts if it has phases) are recorded in it after each step.
+    It starts paused: resume() lets it run, pause() suspends it after the current step. When
+    the network can no longer transmit (non_transmittable), the worker pauses itself and sets
+    dead, the model needs new signals (start_syst) before resume().
+
+    The model is only stepped while holding worker.lock: whoever modifies the model from another
+    thread (start_syst, parameters, links, another model) takes the lock first:
+        with worker.lock:
+            worker.model.start_syst()
+        worker.resume()
+    numpy releases the GIL in the large operations of a step, so the interface stays responsive.
+    The thread is a daemon, it doesn't keep the application alive; stop() ends it."""
+
+    def __init__(self, model, steps_per_second=None, history=None):
+        super().__init__(daemon=True)
+        self.model = model
+        self.steps_per_second = steps_per_second
+        self.history = history
+        self.lock = threading.Lock()
+        self.snapshots = SnapshotBuffer()
+        self.nb_steps = 0
+        self.dead = False
+        self._running = threading.Event()
+        self._stopped = False
+
+    def publish(self):
+        """Publish the current state of the model as last snapshot"""
+        self.snapshots.publish(self.nb_steps, syst_state=self.model.syst_state,
+                               syst_potential=self.model.syst_potential)
+
+    def resume(self):
+        self.dead = False
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def is_paused(self):
+        return not self._running.is_set()
+
+    def stop(self):
+        self._stopped = True
+        self._running.set()
+
+    def run(self):
+        next_step = time.perf_counter()
+        while True:
+            if not self._running.is_set():
+                self._running.wait()
+                next_step = time.perf_counter()
+            if self._stopped:
+                return
+            with self.lock:
+                if self.model.non_transmittable():
+                    self.dead = True
+                    self._running.clear()
+                    continue
+                self.model.update_system_one_step()
+                self.nb_steps += 1
+                self.publish()
+                if self.history is not None:
+                    self.history.record(self.nb_steps, self.model.nb_active,
+                                        getattr(self.model, 'phase_counts', None))
+            if self.steps_per_second:
+                next_step += 1. / self.steps_per_second
+                delay = next_step - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # late (the steps are too slow): don't try to catch up with a burst of steps
+                    next_step = time.perf_counter()
@@ -0,0 +1,190 @@
+import numpy as np
+from py_project.connectivity import CSRLinks, expand_ranges
+from py_project.stimulus import make_rng
+
+
+class GridIndex:
+    """Spatial index of the neurons of a network placed in a plane at (coord_X[i], coord_Y[i]).
+
+    The plane is cut into a uniform grid of square cells of side cell_size and the neurons
+    are sorted by the cell they belong to. To find the neighbors of a neuron within a
+    distance R, only the cells around its own cell are visited instead of all the neurons of
+    the network, so that finding all the pairs of neighbors costs about O(N * k) where k is the
+    mean number of neighbors instead of O(N^2). The best cell_size is the radius R used the
+    most often.
+
+    It does not depend on the dialog so it can be used to build the links of a model from a
+    script:
+        index = GridIndex(coord_X, coord_Y, R)
+        rows, cols = index.pairs_within(R)"""
+
+    def __init__(self, coord_X, coord_Y, cell_size):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.coord_X = np.asarray(coord_X, dtype=float)
+        self.coord_Y = np.asarray(coord_Y, dtype=float)
+        self.N = len(self.coord_X)
+        self.cell_size = float(cell_size)
+        cell_X = np.floor(self.coord_X / self.cell_size).astype(np.int64)
+        cell_Y = np.floor(self.coord_Y / self.cell_size).astype(np.int64)
+        self._origin = (cell_X.min(initial=0), cell_Y.min(initial=0))
+        self._cell_X = cell_X - self._origin[0]
+        self._cell_Y = cell_Y - self._origin[1]
+        self._width = int(self._cell_X.max(initial=0)) + 1
+        self._height = int(self._cell_Y.max(initial=0)) + 1
+        keys = self._cell_X * self._height + self._cell_Y
+        self._order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._order]
+
+    def _candidates(self, cell_X, cell_Y, reach):
+        """Return the pairs (k, j) where j is a neuron of one of the cells at less than reach
+        cells (in each direction) from the cell (cell_X[k], cell_Y[k])."""
+        firsts, lasts, owners = [], [], []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                nx, ny = cell_X + dx, cell_Y + dy
+                valid = (nx >= 0) & (nx < self._width) & (ny >= 0) & (ny < self._height)
+                keys = nx[valid] * self._height + ny[valid]
+                firsts.append(np.searchsorted(self._sorted_keys, keys, side='left'))
+                lasts.append(np.searchsorted(self._sorted_keys, keys, side='right'))
+                owners.append(np.flatnonzero(valid))
+        first, last, owner = np.concatenate(firsts), np.concatenate(lasts), np.concatenate(owners)
+        # expand each range [first, last) of sorted neurons into its own elements
+        return np.repeat(owner, last - first), self._order[expand_ranges(first, last)]
+
+    def pairs_within(self, R, r_min=None):
+        """float -> tuple(array, array)
+        Return the arrays (rows, cols) of all the pairs of distinct neurons i, j such that
+        distance(i, j) <= R. Each pair is given in both orders (i, j) and (j, i).
+        If r_min is given, only the pairs such that r_min < distance(i, j) <= R are returned."""
+        if self.N == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        reach = int(np.ceil(R / self.cell_size))
+        rows, cols = self._candidates(self._cell_X, self._cell_Y, reach)
+        dist_carre = (self.coord_X[rows] - self.coord_X[cols]) ** 2 + \
+                     (self.coord_Y[rows] - self.coord_Y[cols]) ** 2
+        keep = (rows != cols) & (dist_carre <= R ** 2)
+        if r_min is not None:
+            keep &= dist_carre > r_min ** 2
+        rows, cols = rows[keep], cols[keep]
+        order = np.lexsort((cols, rows))
+        return rows[order], cols[order]
+
+    def neighbors_of(self, indices, R):
+        """array * float -> tuple(array, array)
+        Return the arrays (rows, cols) of all the pairs of distinct neurons i, j such that i is
+        one of the neurons indices and distance(i, j) <= R."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        reach = int(np.ceil(R / self.cell_size))
+        k, cols = self._candidates(self._cell_X[indices], self._cell_Y[indices], reach)
+        rows = indices[k]
+        dist_carre = (self.coord_X[rows] - self.coord_X[cols]) ** 2 + \
+                     (self.coord_Y[rows] - self.coord_Y[cols]) ** 2
+        keep = (rows != cols) & (dist_carre <= R ** 2)
+        return rows[keep], cols[keep]
+
+    def query(self, x, y, R):
+        """Return the indices of the neurons at a distance <= R of the point (x, y)."""
+        cell_X = np.array([int(np.floor(x / self.cell_size)) - self._origin[0]])
+        cell_Y = np.array([int(np.floor(y / self.cell_size)) - self._origin[1]])
+        reach = int(np.ceil(R / self.cell_size))
+        _, found = self._candidates(cell_X, cell_Y, reach)
+        dist_carre = (self.coord_X[found] - x) ** 2 + (self.coord_Y[found] - y) ** 2
+        return np.sort(found[dist_carre <= R ** 2])
+
+
+def links_within_distance(coord_X, coord_Y, R, diag, p_connect=0.8, fmt='csr', index=None, rng=None):
+    """Create the links of a network where only the neurons within the R radian of another
+    neuron i can send or receive signal from and to i. Each of these pairs is connected
+    (in one direction) with the probability p_connect.
+    syst_links[i][j] = 1: j connects and can send signal to i, not in reverse
+    syst_links[i][j] = 0: j doesnt connect to i
+    syst_links[i][i] = diag (gamma/beta for the models)
+    Return a store of links of the format fmt built in bulk from the pairs of neighbors,
+    an existing GridIndex of the coordinates can be given to avoid building it again.
+    The connections are drawn with the numpy Generator rng (seeded from np.random if None)."""
+    if index is None:
+        index = GridIndex(coord_X, coord_Y, R)
+    if rng is None:
+        rng = make_rng()
+    rows, cols = index.pairs_within(R)
+    connected = rng.random(len(rows)) < p_connect
+    links = CSRLinks.from_coo(index.N, rows[connected], cols[connected],
+                              np.ones(int(connected.sum())), diag)
+    return links.asformat(fmt)
+
+
+class NeighborhoodGraph:
+    """Connections of a network whose neurons are placed in a plane, where only the neurons
+    within the radius R of each other can be connected (each ordered pair with the probability
+    p_connect, like links_within_distance). The graph is kept up to date when the parameters
+    change instead of being drawn again:
+        set_radius(R): only the pairs whose distance is between the old and the new radius are
+        drawn (R increases) or dropped (R decreases)
+        resize(N, coord_X, coord_Y): only the pairs of the neurons added are drawn, the links
+        of the neurons removed are dropped
+    links(diag) gives the store of links (1 for a connection) to build or update a model.
+    The connections are drawn with the numpy Generator rng (seeded from np.random if None)."""
+
+    def __init__(self, coord_X, coord_Y, R, p_connect=0.8, rng=None):
+        self.rng = make_rng() if rng is None else rng
+        self.coord_X = np.asarray(coord_X, dtype=float)
+        self.coord_Y = np.asarray(coord_Y, dtype=float)
+        self.R = R
+        self.p_connect = p_connect
+        self._index = GridIndex(self.coord_X, self.coord_Y, R)
+        self.rows, self.cols = self._draw(*self._index.pairs_within(R))
+
+    @property
+    def N(self):
+        return len(self.coord_X)
+
+    def _draw(self, rows, cols):
+        """Keep each of the pairs (rows, cols) with the probability p_connect"""
+        connected = self.rng.random(len(rows)) < self.p_connect
+        return rows[connected], cols[connected]
+
+    def _add(self, rows, cols):
+        rows, cols = self._draw(rows, cols)
+        self.rows = np.concatenate((self.rows, rows))
+        self.cols = np.concatenate((self.cols, cols))
+
+    def links(self, diag, fmt='csr'):
+        """Return the store of links of the format fmt of the graph, diag on the diagonal"""
+        links = CSRLinks.from_coo(self.N, self.rows, self.cols, np.ones(len(self.rows)), diag)
+        return links.asformat(fmt)
+
+    def set_radius(self, R):
+        """Change the radius of connection to R, the connections within both radiuses are kept"""
+        if R > self.R:
+            self._add(*self._index.pairs_within(R, r_min=self.R))
+        elif R < self.R:
+            dist_carre = (self.coord_X[self.rows] - self.coord_X[self.cols]) ** 2 + \
+                         (self.coord_Y[self.rows] - self.coord_Y[self.cols]) ** 2
+            keep = dist_carre <= R ** 2
+            self.rows, self.cols = self.rows[keep], self.cols[keep]
+        self.R = R
+
+    def resize(self, N, coord_X=None, coord_Y=None):
+        """Keep the N first neurons or add N - self.N neurons at the coordinates coord_X, coord_Y,
+        the connections between the neurons kept are not changed"""
+        old_N = self.N
+        if N < old_N:
+            keep = (self.rows < N) & (self.cols < N)
+            self.rows, self.cols = self.rows[keep], self.cols[keep]
+            self.coord_X, self.coord_Y = self.coord_X[:N], self.coord_Y[:N]
+        elif N > old_N:
+            if coord_X is None or len(coord_X) != N - old_N or len(coord_Y) != N - old_N:
+                raise ValueError(f"The coordinates of the {N - old_N} neurons added are needed")
+            self.coord_X = np.concatenate((self.coord_X, np.asarray(coord_X, dtype=float)))
+            self.coord_Y = np.concatenate((self.coord_Y, np.asarray(coord_Y, dtype=float)))
+        else:
+            return
+        self._index = GridIndex(self.coord_X, self.coord_Y, self.R)
+        if N > old_N:
+            # pairs (new, any) in this direction, and in the other direction with the old neurons
+            rows, cols = self._index.neighbors_of(np.arange(old_N, N), self.R)
+            old = cols < old_N
+            self._add(np.concatenate((rows, cols[old])), np.concatenate((cols, rows[old])))
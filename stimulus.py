@@ -0,0 +1,90 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+def make_rng(seed=None):
+    """Return the numpy.random.Generator of a model (or of an ensemble) from seed.
+    Without seed (None), the seed of the generator is drawn from the global np.random: creating a
+    model advances np.random by one draw, and np.random.seed(x) called before still makes the
+    whole simulation reproducible.
+    Give an explicit seed for a generator independent of the global state."""
+    if seed is None:
+        seed = np.random.randint(0, 2 ** 32, size=4)
+    return np.random.default_rng(seed)
+
+
+class Stimulus(ABC):
+    """Pattern of the signals fed to the network to kick it off (start_syst).
+
+    A stimulus is called with the random generator of the model and the shape of the vector
+    of potentials (N,) (or (K, N) for K replicas) and returns the potentials added to the
+    neurons, drawn in one call instead of neuron by neuron:
+        model.stimulus = PoissonStimulus(rate=0.2, amplitude=40.)
+        model.start_syst()
+    The default stimulus of each model reproduces its original kick-off."""
+
+    @abstractmethod
+    def __call__(self, rng, shape):
+        """Return the array of shape of the potentials added to the neurons"""
+
+
+class UniformStimulus(Stimulus):
+    """Each neuron receives a potential drawn uniformly in [low, high) (integers if integer is
+    True) multiplied by a sign drawn among signs: signs=(0, 1) feeds half of the neurons,
+    signs=(-1, 0, 1) also sends negative potentials."""
+
+    def __init__(self, low, high, signs=(1,), integer=False):
+        self.low = low
+        self.high = high
+        self.signs = np.asarray(signs, dtype=float)
+        self.integer = integer
+
+    def __call__(self, rng, shape):
+        if self.integer:
+            added = rng.integers(self.low, self.high, shape).astype(float)
+        else:
+            added = rng.uniform(self.low, self.high, shape)
+        if len(self.signs) > 1 or self.signs[0] != 1:
+            added *= rng.choice(self.signs, shape)
+        return added
+
+
+class PoissonStimulus(Stimulus):
+    """Each neuron receives a number of spikes following a Poisson law of parameter rate,
+    each spike bringing amplitude mV"""
+
+    def __init__(self, rate, amplitude):
+        self.rate = rate
+        self.amplitude = amplitude
+
+    def __call__(self, rng, shape):
+        return self.amplitude * rng.poisson(self.rate, shape)
+
+
+class ClusteredStimulus(Stimulus):
+    """Only the neurons around nb_clusters centers drawn among the neurons receive a signal:
+    the neurons at a distance <= radius of a center (coordinates coord_X, coord_Y) get a potential
+    drawn uniformly in [low, high), the others nothing. Each replica gets its own centers."""
+
+    def __init__(self, coord_X, coord_Y, nb_clusters, radius, low, high):
+        self.coord_X = np.asarray(coord_X, dtype=float)
+        self.coord_Y = np.asarray(coord_Y, dtype=float)
+        self.nb_clusters = nb_clusters
+        self.radius = radius
+        self.low = low
+        self.high = high
+
+    def __call__(self, rng, shape):
+        shape = np.atleast_1d(shape)
+        N = shape[-1]
+        if N != len(self.coord_X):
+            raise ValueError(f"The stimulus has the coordinates of {len(self.coord_X)} neurons, not {N}")
+        nb_rows = int(np.prod(shape[:-1], dtype=np.int64))
+        centers = rng.integers(0, N, (nb_rows, self.nb_clusters))
+        # distance of each neuron to the centers of its row: (rows, N, nb_clusters)
+        dist_carre = (self.coord_X[None, :, None] - self.coord_X[centers][:, None, :]) ** 2 + \
+                     (self.coord_Y[None, :, None] - self.coord_Y[centers][:, None, :]) ** 2
+        inside = (dist_carre <= self.radius ** 2).any(axis=2)
+        added = rng.uniform(self.low, self.high, (nb_rows, N)) * inside
+        return added.reshape(tuple(shape))
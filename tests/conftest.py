@@ -0,0 +1,13 @@
+import importlib.util
+import os
+import sys
+
+# the tests import the modules as py_project.x, like the package is used, whatever the name of
+# the directory of the checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if importlib.util.find_spec('py_project') is None:
+    spec = importlib.util.spec_from_file_location('py_project', os.path.join(ROOT, '__init__.py'),
+                                                  submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['py_project'] = module
+    spec.loader.exec_module(module)
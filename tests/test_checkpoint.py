@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from py_project.simplified_model import SimplifiedModel
+from py_project.weighted_model import WeightedModel
+from py_project.psychoactive_model import PsychoactiveModel
+from py_project.potential_decrease_model import PotentialDecreaseModel
+
+MODELS = {
+    SimplifiedModel: (150, 0.3, 0.9),
+    WeightedModel: (150, 0.3, 0.9),
+    PsychoactiveModel: (150, 0.3, 0.9, 0.2),
+    PotentialDecreaseModel: (150, 0.3, 0.9, 0.2, 0.05),
+}
+
+
+@pytest.mark.parametrize('links_format', ['dense', 'csr', 'csc'])
+@pytest.mark.parametrize('model_class', list(MODELS), ids=lambda cls: cls.__name__)
+def test_restored_checkpoint_continues_the_run(model_class, links_format, tmp_path, capsys):
+    """A model restored from a checkpoint saved in the middle of a run gives exactly the same
+    states and potentials as the model that was never stopped"""
+    model = model_class(*MODELS[model_class], links_format, seed=7)
+    for _ in model.simulation(40):
+        pass
+    path = tmp_path / 'checkpoint.npz'
+    model.save_checkpoint(path)
+    restored = model_class.load_checkpoint(path)
+    assert type(restored.syst_links) is type(model.syst_links)
+    for step, ((state, potential), (restored_state, restored_potential)) in enumerate(
+            zip(model.simulation(60), restored.simulation(60))):
+        assert np.array_equal(state, restored_state), f"states differ at step {step}"
+        assert np.array_equal(potential, restored_potential), f"potentials differ at step {step}"
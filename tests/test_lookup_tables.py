@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from py_project.potential_decrease_model import PotentialDecreaseModel
+
+
+@pytest.mark.parametrize('max_error', [1e-4, 1e-6])
+@pytest.mark.parametrize('gamma, deltaT', [(0.9, 0.05), (0.5, 0.2)])
+def test_tables_within_max_error(gamma, deltaT, max_error):
+    """The interpolated func_act_0 and exp(gamma * (1 - lamb)) stay within max_error of the exact
+    functions, inside and beyond the bounds of the tables"""
+    model = PotentialDecreaseModel(20, 0.3, gamma, 0.2, deltaT, seed=0)
+    rng = np.random.default_rng(1)
+    potentiel = rng.uniform(PotentialDecreaseModel.Vmin_ma - 10, PotentialDecreaseModel.threshold + 10, 200000)
+    lamb = rng.uniform(-0.1, 1.1, 200000)
+    exact_act, exact_exp = model.func_act_0_vect(potentiel), np.exp(gamma * (1 - lamb))
+    model.use_lookup_tables(max_error)
+    assert model.tables.error <= max_error
+    assert np.max(np.abs(model.func_act_0_vect(potentiel) - exact_act)) <= max_error
+    assert np.max(np.abs(model._exp_lamb(lamb) - exact_exp)) <= max_error
+    model.tables = None
+    assert np.array_equal(model.func_act_0_vect(potentiel), exact_act)
+
+
+def test_tables_follow_gamma_and_checkpoint(tmp_path, capsys):
+    """The tables are built again when gamma changes and a restored checkpoint keeps using them"""
+    model = PotentialDecreaseModel(100, 0.3, 0.9, 0.2, 0.05, 'csr', seed=3)
+    model.use_lookup_tables(1e-5)
+    model.gamma = 0.8
+    assert model._lookup().gamma == 0.8
+    for _ in model.simulation(30):
+        pass
+    model.save_checkpoint(tmp_path / 'checkpoint.npz')
+    restored = PotentialDecreaseModel.load_checkpoint(tmp_path / 'checkpoint.npz')
+    assert restored.tables is not None and restored.tables.max_error == 1e-5
+    for (state, potential), (restored_state, restored_potential) in zip(model.simulation(30),
+                                                                       restored.simulation(30)):
+        assert np.array_equal(state, restored_state)
+        assert np.array_equal(potential, restored_potential)
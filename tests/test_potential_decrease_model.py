@@ -0,0 +1,50 @@
+import copy
+
+import numpy as np
+import pytest
+
+from py_project.potential_decrease_model import PotentialDecreaseModel
+
+
+def snapshot(model):
+    return [copy.deepcopy(x) for x in
+            (model.syst_potential, model.syst_state, model.phase, model.lamb, model.time_rest)]
+
+
+@pytest.mark.parametrize('links_format', ['dense', 'csr', 'csc'])
+@pytest.mark.parametrize('ca', [0., 0.2, -0.5])
+@pytest.mark.parametrize('seed', [0, 19680801])
+def test_vector_step_matches_loop(seed, ca, links_format, capsys):
+    """The update by phase masks gives the same results as the reference update neuron by neuron"""
+    model = PotentialDecreaseModel(120, 0.1, 0.95, ca, 0.05, links_format, seed=seed)
+    for step in range(150):
+        if model.all_neurones_rest():
+            model.start_syst_1()
+        if model.non_transmittable():
+            model.start_syst()
+            continue
+        before = snapshot(model)
+        model.update_system_one_step_loop()
+        expected = snapshot(model)
+        model.syst_potential, model.syst_state, model.phase, model.lamb, model.time_rest = before
+        model.update_system_one_step()
+        result = snapshot(model)
+        assert np.array_equal(expected[1], result[1]), f"states differ at step {step}"
+        assert np.array_equal(expected[2], result[2]), f"phases differ at step {step}"
+        for x, y in zip(expected, result):
+            np.testing.assert_allclose(np.asarray(y, dtype=float), np.asarray(x, dtype=float),
+                                       rtol=0, atol=1e-9, err_msg=f"step {step}")
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_event_driven_matches_full_step(seed, capsys):
+    """The event-driven steps give the same states, and potentials up to rounding errors, whether
+    the potentials are read at each step or not"""
+    full = PotentialDecreaseModel(300, 0.3, 0.9, 0.2, 0.05, 'csc', seed=seed)
+    event = PotentialDecreaseModel(300, 0.3, 0.9, 0.2, 0.05, 'csc', seed=seed)
+    for step, ((state, potential), (event_state, event_potential)) in enumerate(
+            zip(full.simulation(300), event.simulation(300, event_driven=True))):
+        assert np.array_equal(state, event_state), f"states differ at step {step}"
+        if step % 50 == 0:
+            np.testing.assert_allclose(np.asarray(event_potential), potential, rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(event.phase, full.phase)
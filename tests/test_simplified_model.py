@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from py_project.simplified_model import SimplifiedModel
+from py_project.weighted_model import WeightedModel
+from py_project.spatial_index import links_within_distance
+from py_project.stimulus import PoissonStimulus
+
+
+def make_pair(model_class, seed, beta=0.3, gamma=0.9):
+    """Two models with the same sparse links and seed, kicked off by few neurons at once"""
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(0, 500, (2, 400))
+    links = links_within_distance(coords[0], coords[1], 20., gamma / beta, fmt='csc', rng=rng)
+    models = []
+    for _ in range(2):
+        model = model_class(400, beta, gamma, 'csc', links, seed=seed)
+        model.stimulus = PoissonStimulus(0.05, 60.)
+        model.verbose = False
+        models.append(model)
+    return models
+
+
+@pytest.mark.parametrize('model_class', [SimplifiedModel, WeightedModel], ids=lambda cls: cls.__name__)
+@pytest.mark.parametrize('seed', [0, 1])
+def test_event_driven_matches_full_step(model_class, seed):
+    """The event-driven steps give the same states, and potentials up to rounding errors, whether
+    the potentials are read at each step or not"""
+    full, event = make_pair(model_class, seed)
+    for step, ((state, potential), (event_state, event_potential)) in enumerate(
+            zip(full.simulation(300), event.simulation(300, event_driven=True))):
+        assert np.array_equal(state, event_state), f"states differ at step {step}"
+        if step % 50 == 0:
+            np.testing.assert_allclose(np.asarray(event_potential), potential, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(event.syst_potential, full.syst_potential, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('model_class', [SimplifiedModel, WeightedModel], ids=lambda cls: cls.__name__)
+def test_event_driven_with_leak_above_one(model_class):
+    """When beta is raised so that beta * syst_links[i][i] >= 1, the idle neurons can fire by
+    themselves and the event-driven step falls back to the whole step"""
+    full, event = make_pair(model_class, 2, beta=0.1)
+    for step, ((state, potential), (event_state, event_potential)) in enumerate(
+            zip(full.simulation(200), event.simulation(200, event_driven=True))):
+        if step == 100:
+            full.beta = event.beta = 0.12
+        assert np.array_equal(state, event_state), f"states differ at step {step}"
+        np.testing.assert_allclose(np.asarray(event_potential), potential, rtol=1e-12, atol=1e-9)
+    assert np.all(event.leak_factor() >= 1)
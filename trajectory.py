@@ -0,0 +1,171 @@
+import json
+import os
+
+import numpy as np
+
+
+class TrajectoryRecorder:
+    """Record the trajectory of a simulation on disk with a fixed use of memory.
+
+    A simulation() generator yields (syst_state, syst_potential) at every step; keeping them
+    in lists makes the memory grow with N x steps. The recorder consumes the generator and
+    keeps only one frame every decimation steps, bufferized in chunks of chunk_size frames.
+    Each full chunk is written to a directory path which contains:
+        states.npy: matrix (frames, ceil(N/8)) of uint8, the states packed 8 neurons per byte
+        potentials.npy: matrix (frames, N) of float32, the potentials
+        coords.npy: matrix (N, 2) of the coordinates of the neurons, if given
+        meta.json: N, decimation, number of frames recorded, ...
+    The .npy files are created with their full size at the start (capacity frames) and
+    filled as memory maps so they can be reloaded lazily with np.load(..., mmap_mode='r').
+    Only the first nb_frames frames (given in meta.json) are meaningful.
+
+        with TrajectoryRecorder('run', model.N, nb_steps, decimation=10) as recorder:
+            recorder.record(model.simulation(nb_steps))"""
+
+    def __init__(self, path, N, nb_steps, decimation=1, chunk_size=1024, coords=None, model=None):
+        if decimation < 1 or chunk_size < 1:
+            raise ValueError("decimation and chunk_size must be at least 1")
+        self.path = path
+        self.N = N
+        self.decimation = decimation
+        self.chunk_size = chunk_size
+        self.capacity = -(-nb_steps // decimation)
+        self.nb_frames = 0
+        self.nb_steps = 0
+        self.model = model
+        os.makedirs(path, exist_ok=True)
+        self._states = np.lib.format.open_memmap(
+            os.path.join(path, 'states.npy'), mode='w+', dtype=np.uint8, shape=(self.capacity, -(-N // 8)))
+        self._potentials = np.lib.format.open_memmap(
+            os.path.join(path, 'potentials.npy'), mode='w+', dtype=np.float32, shape=(self.capacity, N))
+        if coords is not None:
+            np.save(os.path.join(path, 'coords.npy'), np.asarray(coords, dtype=float).reshape(N, 2))
+        self._buffer_states = np.zeros((chunk_size, N), dtype=bool)
+        self._buffer_potentials = np.zeros((chunk_size, N), dtype=np.float32)
+        self._buffered = 0
+        self.write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, state, potential):
+        """Add the frame of a step of simulation. Only one step every decimation steps is kept."""
+        if self.nb_steps % self.decimation == 0:
+            if self.nb_frames + self._buffered >= self.capacity:
+                raise ValueError(f"The recorder is full ({self.capacity} frames)")
+            self._buffer_states[self._buffered] = state
+            self._buffer_potentials[self._buffered] = potential
+            self._buffered += 1
+            if self._buffered == self.chunk_size:
+                self.flush()
+        self.nb_steps += 1
+
+    def record(self, simulation):
+        """Consume a simulation() generator and record its frames. Return the number of frames recorded."""
+        for state, potential in simulation:
+            self.append(state, potential)
+        self.flush()
+        return self.nb_frames
+
+    def flush(self):
+        """Write the frames of the buffer on disk"""
+        if self._buffered == 0:
+            return
+        end = self.nb_frames + self._buffered
+        self._states[self.nb_frames:end] = np.packbits(self._buffer_states[:self._buffered], axis=1)
+        self._potentials[self.nb_frames:end] = self._buffer_potentials[:self._buffered]
+        self._states.flush()
+        self._potentials.flush()
+        self.nb_frames = end
+        self._buffered = 0
+        self.write_meta()
+
+    def write_meta(self):
+        meta = {'N': self.N, 'decimation': self.decimation, 'nb_frames': self.nb_frames,
+                'nb_steps': self.nb_steps, 'capacity': self.capacity, 'chunk_size': self.chunk_size,
+                'model': self.model}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def close(self):
+        self.flush()
+        self.write_meta()
+        del self._states, self._potentials
+
+
+def record_simulation(model, path, nb_steps, decimation=1, chunk_size=1024, coords=None):
+    """Run model.simulation(nb_steps) and record it in the directory path, see TrajectoryRecorder.
+    Return the number of frames recorded."""
+    with TrajectoryRecorder(path, model.N, nb_steps, decimation, chunk_size, coords,
+                            type(model).__name__) as recorder:
+        return recorder.record(model.simulation(nb_steps))
+
+
+class TrajectoryReader:
+    """Read a trajectory recorded by TrajectoryRecorder without loading it in memory.
+
+    The files are memory mapped so opening a recording is immediate whatever its length, and
+    going to any step of the run costs O(1): only the frame asked is read from the disk.
+        reader = TrajectoryReader('run')
+        state, potential = reader.at_step(5000)
+        for state, potential in reader.simulation():  # same interface as model.simulation()
+            ...
+    Only one step every decimation steps was recorded, at_step gives the last frame recorded
+    before the step asked."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.N = self.meta['N']
+        self.decimation = self.meta['decimation']
+        self.nb_frames = self.meta['nb_frames']
+        self._states = np.load(os.path.join(path, 'states.npy'), mmap_mode='r')
+        self._potentials = np.load(os.path.join(path, 'potentials.npy'), mmap_mode='r')
+        coords = os.path.join(path, 'coords.npy')
+        self.coords = np.load(coords) if os.path.exists(coords) else None
+
+    def __len__(self):
+        return self.nb_frames
+
+    def _check(self, frame):
+        if frame < 0:
+            frame += self.nb_frames
+        if not 0 <= frame < self.nb_frames:
+            raise IndexError(f"frame {frame} out of the {self.nb_frames} frames recorded")
+        return frame
+
+    def __getitem__(self, frame):
+        """Return (syst_state, syst_potential) of the frame number frame"""
+        frame = self._check(frame)
+        state = np.unpackbits(self._states[frame], count=self.N).astype(int)
+        return state, np.array(self._potentials[frame], dtype=float)
+
+    def step_of(self, frame):
+        """Return the step of simulation at which the frame was recorded"""
+        return self._check(frame) * self.decimation
+
+    def at_step(self, step):
+        """Return (syst_state, syst_potential) at the step of simulation step (or the last frame
+        recorded before it)"""
+        return self[min(step // self.decimation, self.nb_frames - 1)]
+
+    def windows(self, size, start=0, stop=None):
+        """Iterate over the frames [start, stop) by windows of size frames.
+        Yield the matrixes (frames, N) of states and potentials of each window."""
+        stop = self.nb_frames if stop is None else min(stop, self.nb_frames)
+        for begin in range(start, stop, size):
+            end = min(begin + size, stop)
+            states = np.unpackbits(self._states[begin:end], axis=1, count=self.N).astype(int)
+            yield states, np.array(self._potentials[begin:end], dtype=float)
+
+    def simulation(self, nb_steps=None, start=0):
+        """Replay the recording like model.simulation(nb_steps): yield (syst_state, syst_potential)
+        frame after frame from the frame start"""
+        stop = self.nb_frames if nb_steps is None else min(start + nb_steps, self.nb_frames)
+        for states, potentials in self.windows(256, start, stop):
+            for state, potential in zip(states, potentials):
+                yield (state, potential)
@@ -1,19 +1,31 @@
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.widgets import Slider
 from py_project.simplified_model import SimplifiedModel
 from py_project.weighted_model import WeightedModel
 from py_project.psychoactive_model import PsychoactiveModel
 from py_project.potential_decrease_model import PotentialDecreaseModel
+from py_project.trajectory import TrajectoryReader
+from py_project.network_view import NetworkMap, MIN_SCATTER_SIZE
 
 # Fixing random state for reproducibility
 np.random.seed(19680801)
 
-MIN_SIZE = 50
 FRAMES_PER_UPDATE = 5
 
-model = PotentialDecreaseModel(200, 0.1, 0.95, 0, 0.05)
-model.start_syst()
+# Replay a run recorded by TrajectoryRecorder if its directory is given:
+#     python visualize_model.py run_dir
+# otherwise simulate a new model
+reader = TrajectoryReader(sys.argv[1]) if len(sys.argv) > 1 else None
+if reader is None:
+    model = PotentialDecreaseModel(200, 0.1, 0.95, 0, 0.05)
+    model.start_syst()
+    syst_state, syst_potential = model.syst_state, model.syst_potential
+    frames = model.simulation(sys.maxsize)
+else:
+    syst_state, syst_potential = reader[0]
 
 # Create new Figure and an Axes which fills it.
 fig = plt.figure(figsize=(7, 7))
@@ -23,34 +35,35 @@ ax.set_xticks([])
 ax.set_ylim(0, 1)
 ax.set_yticks([])
 
-color = ['red' if model.syst_state[i] == 1 else
-         ('green' if model.syst_potential[i] >= 0 else 'blue') for i in range(model.N)]
-size = [abs(x) + MIN_SIZE for x in model.syst_potential]
-
 # Initialize the raindrops in random positions and with
 # random growth rates.
-position = np.random.uniform(0, 1, (model.N, 2))
+if reader is not None and reader.coords is not None:
+    position = (reader.coords - reader.coords.min(axis=0)) / np.ptp(reader.coords, axis=0).clip(min=1e-9)
+else:
+    position = np.random.uniform(0, 1, (len(syst_state), 2))
+
+# Construct the map which we will update during animation
+# as the raindrops develop: the scatter of the neurons, or their density
+# when too many neurons are visible (recorded runs of 100k neurons)
+network_map = NetworkMap(ax, position[:, 0], position[:, 1], MIN_SCATTER_SIZE)
+network_map.update(syst_state, syst_potential)
+
 
-# Construct the scatter which we will update during animation
-# as the raindrops develop.
-scat = ax.scatter(position[:, 0], position[:, 1],
-                  s=size, lw=0.5, c=color, edgecolors=color)
+if reader is not None:
+    # slider to scrub through the recorded run, the animation moves it forward one frame at a time
+    fig.subplots_adjust(bottom=0.1)
+    slider = Slider(fig.add_axes([0.15, 0.03, 0.7, 0.03]), 'frame', 0, len(reader) - 1,
+                    valinit=0, valstep=1)
 
 
 def update(frame_number):
-    if model.all_neurones_rest():
-        model.start_syst_1()
-    if model.non_transmittable():
-        model.start_syst()
+    if reader is None:
+        syst_state, syst_potential = next(frames)
     else:
-        model.update_system_one_step()
-    color = ['red' if model.syst_state[i] == 1 else
-             ('green' if model.syst_potential[i] >= 0 else 'blue') for i in range(model.N)]
-    size = [abs(x) + MIN_SIZE for x in model.syst_potential]
-    scat.set_sizes(size)
-    scat.set_edgecolors(color)
-    scat.set_color(color)
-    return scat,
+        frame = (int(slider.val) + 1) % len(reader)
+        slider.set_val(frame)
+        syst_state, syst_potential = reader[frame]
+    return network_map.update(syst_state, syst_potential)
 
 
 # # Construct the animation, using the update function as the animation director.
@@ -1,5 +1,6 @@
 import numpy as np
 from py_project.simplified_model import SimplifiedModel
+from py_project.stimulus import UniformStimulus
 
 
 class WeightedModel(SimplifiedModel):
@@ -29,12 +30,34 @@ class WeightedModel(SimplifiedModel):
     equal to Vmin. The Vrest will be in use later in an updated model.
     """
     Vmin = -30.
+    stimulus = UniformStimulus(Vmin, SimplifiedModel.Vmax, integer=True)
 
-    def __init__(self, N, beta, gamma):
-        super().__init__(N, beta, gamma)
+    # sums of the random weights of each column before their normalisation, to give the links
+    # kept by set_links their weight back
+    _weight_totals = None
+
+    def __init__(self, N, beta, gamma, links_format='dense', links=None, seed=None):
+        super().__init__(N, beta, gamma, links_format, links, seed)
         self.init_system_links_weighted()
 
-    def init_system_links_weighted(self):
+    def checkpoint_arrays(self):
+        arrays = super().checkpoint_arrays()
+        if self._weight_totals is not None:
+            arrays['weight_totals'] = self._weight_totals
+        return arrays
+
+    def restore_checkpoint(self, arrays):
+        super().restore_checkpoint(arrays)
+        self._weight_totals = np.array(arrays['weight_totals']) if 'weight_totals' in arrays else None
+
+    def set_links(self, links):
+        # the weights are drawn on the structure of connections given, the links which were
+        # already there keep theirs
+        previous, totals = self.syst_links, self._weight_totals
+        super().set_links(links)
+        self.init_system_links_weighted(previous, totals)
+
+    def init_system_links_weighted(self, previous=None, previous_totals=None):
         """Create a matrix of 2 dimensions (NxN) which shows the connections between
         neurons in the system. Initiated randomly and stay the same throughout the
         simulation.
@@ -46,36 +69,40 @@ class WeightedModel(SimplifiedModel):
         syst_links[i][i] = gamma/beta where gamma is the factor of leaking potential
         of the neuron i.
 
-        sum(syst_links[i in range(N), i != j][j] = 1"""
-
-        def count_connections(connections):
-            """List[List[int]] -> List[int]
-            Count the number of 1 in each column, except for the case
-            where no row = no column
-            connections has #cols = #rows"""
-            size = len(connections)
-            res = [0 for i in range(size)]
-            for i in range(size):
-                for j in range(size):
-                    if i != j and connections[i][j] == 1:
-                        res[j] += 1
-            return res
-
-        def decompose(n):
-            """int -> list[float]
-            Return a list of random floats whose sum equals to 1."""
-            res = np.random.random(n)
-            res /= res.sum()
-            return res
-
-        count_conn = count_connections(self.syst_links)
-        for col in range(self.N):
-            L = decompose(count_conn[col])
-            k = 0
-            for row in range(self.N):
-                if row != col and self.syst_links[row][col] == 1:
-                    self.syst_links[row][col] = np.random.choice([-1, 1]) * L[k]
-                    k += 1
+        sum(abs(syst_links[i in range(N), i != j][j])) = 1
+
+        All the columns are drawn at once directly in the store of syst_links: each link gets
+        a random weight, divided by the sum of the weights of its column (np.bincount), and a
+        random sign. Only the stored links are visited (the non zeros ones for a sparse store).
+
+        previous are the weighted links replaced by this structure (set_links) and previous_totals
+        the sums their weights were divided by: the links found in both keep their random weight
+        and sign, only the links added are drawn, then the columns are divided again by their sum."""
+        links = self.syst_links
+        positions = np.flatnonzero(links.data == 1)
+        rows, cols = links.locate(positions)
+        connected = rows != cols
+        positions, rows, cols = positions[connected], rows[connected], cols[connected]
+        weights = np.empty(len(positions))
+        signs = np.empty(len(positions))
+        added = np.ones(len(positions), dtype=bool)
+        if previous is not None:
+            old_rows, old_cols, old_values = previous.to_coo()
+            if len(old_values):
+                size = max(self.N, previous.N)
+                old_keys, keys = old_rows * size + old_cols, rows * size + cols
+                order = np.argsort(old_keys)
+                found = order[np.searchsorted(old_keys, keys, sorter=order).clip(max=len(order) - 1)]
+                added = old_keys[found] != keys
+                found = found[~added]
+                old_totals = np.ones(previous.N) if previous_totals is None else previous_totals
+                weights[~added] = np.abs(old_values[found]) * old_totals[old_cols[found]]
+                signs[~added] = np.sign(old_values[found])
+        weights[added] = self.rng.random(np.count_nonzero(added))
+        signs[added] = self.rng.choice([-1, 1], np.count_nonzero(added))
+        totals = np.bincount(cols, weights=weights, minlength=self.N)
+        links.data[positions] = signs * weights / totals[cols]
+        self._weight_totals = totals
 
     def func_act(self, val_poten: float):
         """float => float
@@ -90,20 +117,24 @@ class WeightedModel(SimplifiedModel):
         else:
             return val_poten
 
+    def func_act_vect(self, val_poten):
+        """array(N,) => array(N,)
+        Same as func_act but applied to the potentials of all the neurons at once."""
+        return np.where(val_poten > WeightedModel.threshold, WeightedModel.Vmax,
+                        np.maximum(val_poten, WeightedModel.Vmin))
+
     def start_syst(self):
         """Send in the information in form electric ranged between Vmin and Vmax (mV)
-        to kick off the system."""
-        print("Feed potentials to the system.")
-        # print("potential before: \n", np.array(self.syst_potential))
-        # np.random.seed(19680801)
-        added_values = []
-        for i in range(self.N):
-            x = np.random.randint(WeightedModel.Vmin, WeightedModel.Vmax)
-            self.syst_potential[i] = self.func_act(self.syst_potential[i] + x)
-            added_values.append(x)
-            self.syst_state[i] = 1 if self.syst_potential[i] == WeightedModel.Vmax else 0
-        # print("added_values: \n", np.array(added_values))
-        # print("potential after: \n", np.array(self.syst_potential))
+        to kick off the system. The potentials are drawn all at once by self.stimulus."""
+        start = self.profiler.clock() if self.profiler is not None else 0.
+        if self.verbose:
+            print("Feed potentials to the system.")
+        added_values = self.stimulus(self.rng, self.N)
+        self.syst_potential = self.func_act_vect(self.syst_potential + added_values)
+        self.syst_state = (self.syst_potential == WeightedModel.Vmax).astype(int)
+        self.nb_kicks += 1
+        if self.profiler is not None:
+            self.profiler.kick('start_syst', start)
 
 
 if __name__ == '__main__':